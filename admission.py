@@ -0,0 +1,184 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Any, Optional
+
+class Overloaded(Exception):
+    def __init__(self, status: int, retry_after: float, reason: str):
+        """A request turned away: HTTP status (429 or 503) and seconds to wait before retrying"""
+        super().__init__(reason)
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        """Refills `rate` tokens per second up to `burst`; each request takes one"""
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token; returns 0 on success, else the seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class RateLimiter:
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000):
+        """Per-client token buckets; the least recently seen clients are forgotten beyond max_clients"""
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    def check(self, client: str):
+        """Raise Overloaded(429) if the client has no tokens left"""
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.burst)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+            wait = bucket.take()
+            if wait:
+                self.limited += 1
+        if wait:
+            raise Overloaded(429, wait, "Rate limit exceeded")
+
+class Stage:
+    def __init__(self, name: str, concurrency: int, queue_size: int = 32, queue_timeout: float = 5.0):
+        """At most `concurrency` requests inside the stage and `queue_size` waiting for a slot
+
+        A request arriving to a full queue is rejected at once; one that waits longer
+        than queue_timeout is rejected too. Retry-After is estimated from the queue
+        length and the average time a request spends in the stage.
+        """
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self._service_time = 0.0  # Moving average, seconds
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+
+    @contextmanager
+    def slot(self):
+        acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                if self.queued >= self.queue_size:
+                    self.rejected_full += 1
+                    raise Overloaded(503, self._retry_after(), f"Server busy ({self.name} queue full)")
+                self.queued += 1
+                self.max_queued = max(self.max_queued, self.queued)
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+            with self._lock:
+                self.queued -= 1
+                if not acquired:
+                    self.rejected_timeout += 1
+                    raise Overloaded(503, self._retry_after(), f"Server busy ({self.name} queue timeout)")
+
+        with self._lock:
+            self.in_flight += 1
+            self.admitted += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self.in_flight -= 1
+                self._service_time = elapsed if not self._service_time else 0.9 * self._service_time + 0.1 * elapsed
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'concurrency': self.concurrency,
+                'in_flight': self.in_flight,
+                'queued': self.queued,
+                'max_queued': self.max_queued,
+                'admitted': self.admitted,
+                'rejected_full': self.rejected_full,
+                'rejected_timeout': self.rejected_timeout,
+                'avg_service_ms': round(self._service_time * 1000, 1)
+            }
+
+    def _retry_after(self) -> float:
+        # Time for the current queue to drain through the stage's slots
+        return self._service_time * (self.queued + 1) / self.concurrency
+
+class AdmissionController:
+    def __init__(self, stages: Dict[str, Stage], rate_limiter: Optional[RateLimiter] = None,
+                 max_in_flight: Optional[int] = None):
+        """Admission for /chat: per-client rate limit, a cap on requests in flight, then per-stage slots"""
+        self.stages = stages
+        self.rate_limiter = rate_limiter
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected_in_flight = 0
+
+    @contextmanager
+    def request(self, client: str):
+        """Admit one request from `client` (raises Overloaded when it must be turned away)"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.check(client)
+        with self._lock:
+            if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+                self.rejected_in_flight += 1
+                raise Overloaded(503, 1.0, "Server busy (too many requests in flight)")
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def stage(self, name: str):
+        """Context manager holding a slot of the named stage (no-op for unknown stages)"""
+        stage = self.stages.get(name)
+        return stage.slot() if stage is not None else nullcontext()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            result = {'in_flight': self.in_flight, 'rejected_in_flight': self.rejected_in_flight}
+        result['rate_limited'] = self.rate_limiter.limited if self.rate_limiter is not None else 0
+        result['stages'] = {name: stage.stats() for name, stage in self.stages.items()}
+        return result
+
+def make_admission_controller(encode: int, retrieve: int, generate: int, queue_size: int = 32,
+                              queue_timeout: float = 5.0, max_in_flight: int = 0,
+                              rate: float = 0.0, burst: float = 10.0) -> Optional[AdmissionController]:
+    """Build the /chat admission layer from config; a concurrency of 0 leaves that stage unlimited"""
+    stages = {
+        name: Stage(name, concurrency, queue_size, queue_timeout)
+        for name, concurrency in (('encode', encode), ('retrieve', retrieve), ('generate', generate))
+        if concurrency > 0
+    }
+    rate_limiter = RateLimiter(rate, burst) if rate > 0 else None
+    if not stages and rate_limiter is None and not max_in_flight:
+        return None
+    return AdmissionController(stages, rate_limiter, max_in_flight or None)
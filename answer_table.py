@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Precomputed answers for frequent questions
+
+An offline build runs a question list through the full chatbot pipeline and stores
+the answers with their query embeddings, tagged with the knowledge-base version.
+/chat serves an exact (normalized text) or near-exact (embedding) match instantly
+and falls through to the live path otherwise.
+
+Usage:
+    python answer_table.py [questions.txt] [--simple] [--out answer_table.json]
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from latency_slo import LLM_ANSWERS
+from retrieval import normalize_query
+
+try:
+    import fcntl  # Cross-process build lock; not available on Windows
+except ImportError:
+    fcntl = None
+
+SERVED_PRECOMPUTED = "precomputed"
+
+# Answers worth pinning for a whole database version (not fallbacks, apologies or no_context)
+STORABLE_ANSWERS = LLM_ANSWERS + ("rule_based",)
+
+DEFAULT_QUESTIONS = [
+    "What services does MachDatum provide?",
+    "How can I contact MachDatum?",
+    "Tell me about the company",
+    "What technologies do you work with?",
+    "Who are the team members?",
+    "Tell me about the company's background",
+    "What technologies does MachDatum work with?",
+    "What is MachDatum's email address?",
+    "What is MachDatum's phone number?",
+    "Where is MachDatum located?"
+]
+
+def normalize_question(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+class AnswerTable:
+    def __init__(self, path: str, similarity_threshold: float = 0.97):
+        """Precomputed answers loaded from `path` (if it exists), valid for one database version"""
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self._snapshot = None  # Swapped as a whole on load/rebuild
+        self._rebuild_lock = threading.Lock()
+        self.hits = 0
+        self.lookups = 0
+
+        if os.path.exists(path):
+            self.load()
+
+    def load(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            table = json.load(f)
+        self._snapshot = self._make_snapshot(table)
+        print(f"Loaded answer table with {len(table['answers'])} answers")
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._snapshot['version'] if self._snapshot else None
+
+    def is_stale(self, version) -> bool:
+        return self._snapshot is None or self._snapshot['version'] != version
+
+    def lookup_text(self, query: str, version) -> Optional[Dict[str, Any]]:
+        """Exact match on the normalized question text (no encoding needed)
+
+        A hit is a dict with the stored 'result', the question's 'embedding' and the
+        'context_ids' it was answered from.
+        """
+        snapshot = self._snapshot
+        self.lookups += 1
+        if snapshot is None or snapshot['version'] != version:
+            return None
+        position = snapshot['by_text'].get(normalize_question(query))
+        return self._hit(snapshot, position)
+
+    def lookup_embedding(self, query_embedding, version) -> Optional[Dict[str, Any]]:
+        """Near-exact match: the closest stored question above the similarity threshold"""
+        snapshot = self._snapshot
+        if snapshot is None or snapshot['version'] != version or snapshot['matrix'].shape[0] == 0:
+            return None
+        scores = snapshot['matrix'] @ normalize_query(query_embedding)
+        position = int(np.argmax(scores))
+        return self._hit(snapshot, position if scores[position] >= self.similarity_threshold else None)
+
+    def build(self, chatbot, questions: List[str], max_workers: int = 4):
+        """Answer every question through the live pipeline and write the table for the current version"""
+        with self._rebuild_lock:
+            index = chatbot.index
+            embeddings = chatbot.model.encode(questions)
+
+            # Generation is I/O-bound (Gemini), so answer several questions at once
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                answered = list(executor.map(lambda question: chatbot.chat(question, use_precomputed=False),
+                                             questions))
+
+            # The full question list is kept, so a skipped question is retried on the next rebuild
+            table = {'version': index.version, 'questions': list(questions), 'answers': []}
+            for question, embedding, result in zip(questions, embeddings, answered):
+                if result.get('served_by') not in STORABLE_ANSWERS:
+                    print(f"Skipping '{question}': answered by {result.get('served_by')}")
+                    continue
+                table['answers'].append({
+                    'question': question,
+                    'embedding': normalize_query(embedding).tolist(),
+                    'context_ids': result['context_ids'],
+                    'result': {key: value for key, value in result.items() if key not in ('served_by', 'context_ids')}
+                })
+
+            # Several workers may rebuild at once; each writes its own temp file
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(table, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+
+            self._snapshot = self._make_snapshot(table)
+            print(f"Built answer table with {len(table['answers'])} answers for database version {index.version}")
+
+    def refresh(self, chatbot):
+        """Bring a stale table up to the chatbot's database version
+
+        Picks up a table another process already rebuilt for this version, otherwise
+        rebuilds in the background; until then lookups miss and requests go live.
+        Across processes only one rebuilds at a time (see rebuild_async).
+        """
+        version = chatbot.index.version
+        if not self.is_stale(version):
+            return
+        if os.path.exists(self.path):
+            self.load()
+            if not self.is_stale(version):
+                return
+        self.rebuild_async(chatbot)
+
+    def rebuild_async(self, chatbot):
+        """Rebuild stale answers in the background with the table's own question list
+
+        Workers sharing the table file take turns on a lock file: the first builds,
+        the others wait for it and load its table instead of calling Gemini again.
+        """
+        snapshot = self._snapshot
+        if snapshot is None or self._rebuild_lock.locked():
+            return
+        questions = list(snapshot['questions'])
+
+        def run():
+            try:
+                # Rebuild again if the database changed while this build was running
+                while self.is_stale(chatbot.index.version):
+                    with self._build_lock_file():
+                        if os.path.exists(self.path):
+                            self.load()
+                        if self.is_stale(chatbot.index.version):
+                            self.build(chatbot, questions)
+            except Exception as e:
+                print(f"Answer table rebuild failed: {e}")
+        threading.Thread(target=run, name="answer-table-rebuild", daemon=True).start()
+
+    @contextmanager
+    def _build_lock_file(self):
+        """Exclusive lock shared by every process using this table file (no-op without fcntl)"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            'answers': len(snapshot['results']) if snapshot else 0,
+            'version': snapshot['version'] if snapshot else None,
+            'lookups': self.lookups,
+            'hits': self.hits
+        }
+
+    def _hit(self, snapshot, position) -> Optional[Dict[str, Any]]:
+        if position is None:
+            return None
+        self.hits += 1
+        return {
+            'result': snapshot['results'][position],
+            'embedding': snapshot['matrix'][position],
+            'context_ids': snapshot['context_ids'][position]
+        }
+
+    @staticmethod
+    def _make_snapshot(table: Dict[str, Any]) -> Dict[str, Any]:
+        answers = table['answers']
+        return {
+            'version': table['version'],
+            'questions': table.get('questions', [answer['question'] for answer in answers]),
+            'by_text': {normalize_question(answer['question']): position for position, answer in enumerate(answers)},
+            'matrix': np.asarray([answer['embedding'] for answer in answers], dtype=np.float32).reshape(len(answers), -1)
+            if answers else np.zeros((0, 0), dtype=np.float32),
+            'context_ids': [answer['context_ids'] for answer in answers],
+            'results': [answer['result'] for answer in answers]
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed answer table")
+    parser.add_argument('questions', nargs='?', help="Text file with one question per line")
+    parser.add_argument('--out', default=os.getenv('ANSWER_TABLE_PATH', 'answer_table.json'))
+    parser.add_argument('--db', default=os.getenv('KNOWLEDGE_DB', 'machdatum_rag_db.json'))
+    parser.add_argument('--simple', action='store_true', help="Use rule-based answers instead of Gemini")
+    args = parser.parse_args()
+
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        with open(args.questions, 'r', encoding='utf-8') as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    if args.simple:
+        from simple_rag_chatbot import SimpleRAGChatbot
+        chatbot = SimpleRAGChatbot(args.db)
+    else:
+        from dotenv import load_dotenv
+        from rag_chatbot import RAGChatbot
+        load_dotenv()
+        chatbot = RAGChatbot(args.db, os.getenv('GEMINI_API_KEY'))
+
+    AnswerTable(args.out).build(chatbot, questions)
+
+if __name__ == "__main__":
+    main()
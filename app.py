@@ -1,7 +1,16 @@
 from flask import Flask, render_template, request, jsonify
 from flask_cors import CORS
 from rag_chatbot import RAGChatbot
+from reranker import make_reranker
+from semantic_cache import SemanticCache
+from hot_reload import DatabaseWatcher
+from session_store import make_session_store
+from answer_table import AnswerTable
+from parallel_search import make_searcher
+from admission import Overloaded, make_admission_controller
+from serve_shared import serving_options_from_env
 import os
+from contextlib import nullcontext
 from dotenv import load_dotenv
 from ensure_database import ensure_database_exists
 
@@ -22,7 +31,63 @@ if not GEMINI_API_KEY:
 FLASK_PORT = int(os.getenv('FLASK_PORT', 5000))
 FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
 
+# Two-stage retrieval: re-rank a wider cosine candidate pool ('lexical', 'linear', 'cross-encoder')
+RERANK_SCORER = os.getenv('RERANK_SCORER', '')
+RERANK_CANDIDATE_POOL = int(os.getenv('RERANK_CANDIDATE_POOL', 20))
+RERANK_BUDGET_MS = float(os.getenv('RERANK_BUDGET_MS', 50))
+
+# Latency SLO: answer from rule-based formatting if Gemini misses the deadline
+LLM_DEADLINE_SECONDS = float(os.getenv('LLM_DEADLINE_SECONDS')) if os.getenv('LLM_DEADLINE_SECONDS') else None
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv('LLM_HEDGE_AFTER_SECONDS')) if os.getenv('LLM_HEDGE_AFTER_SECONDS') else None
+
+# Semantic cache: reuse answers for paraphrased questions (disabled unless a threshold is set)
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD')) if os.getenv('SEMANTIC_CACHE_THRESHOLD') else None
+SEMANTIC_CACHE_SIZE = int(os.getenv('SEMANTIC_CACHE_SIZE', 512))
+
+# Hot reload: poll the database file every DB_WATCH_INTERVAL seconds (0 disables)
+DB_WATCH_INTERVAL = float(os.getenv('DB_WATCH_INTERVAL', 5))
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+# KNOWLEDGE_DB may point at a SQLite store (.sqlite) written by create_database.py --sqlite;
+# under serve_shared.py workers map the exported index (and watch its manifest) instead
+DB_SOURCE = os.getenv('SHARED_INDEX_MANIFEST') or os.getenv('KNOWLEDGE_DB', "machdatum_rag_db.json")
+
+# Conversation sessions ('memory', 'sqlite', or empty to disable)
+SESSION_STORE = os.getenv('SESSION_STORE', 'memory')
+SESSION_TTL_SECONDS = float(os.getenv('SESSION_TTL_SECONDS', 1800))
+SESSION_MAX = int(os.getenv('SESSION_MAX', 1000))
+SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', 'sessions.db')
+
+# Precomputed answers for frequent questions, built with answer_table.py (empty to disable)
+ANSWER_TABLE_PATH = os.getenv('ANSWER_TABLE_PATH', '')
+ANSWER_TABLE_THRESHOLD = float(os.getenv('ANSWER_TABLE_THRESHOLD', 0.97))
+
+# Exact search over SEARCH_THREADS threads in blocks of SEARCH_BLOCK_ROWS rows
+# (1 = blocked scan on the request thread, 0 = plain NumPy scan of the whole matrix)
+SEARCH_THREADS = int(os.getenv('SEARCH_THREADS', 1))
+SEARCH_BLOCK_ROWS = int(os.getenv('SEARCH_BLOCK_ROWS', 4096))
+
+# Query encoder is chosen by ENCODER (see encoders.py); refuse a database it does not reproduce
+# to within ENCODER_TOLERANCE cosine (empty to skip the check)
+ENCODER_TOLERANCE = float(os.getenv('ENCODER_TOLERANCE', 0.05)) if os.getenv('ENCODER_TOLERANCE', '0.05') else None
+
+# Admission control: concurrency per stage (0 = unlimited), bounded wait queues and per-client rate limits
+ADMISSION_ENCODE_CONCURRENCY = int(os.getenv('ADMISSION_ENCODE_CONCURRENCY', 4))
+ADMISSION_RETRIEVE_CONCURRENCY = int(os.getenv('ADMISSION_RETRIEVE_CONCURRENCY', 8))
+ADMISSION_GENERATE_CONCURRENCY = int(os.getenv('ADMISSION_GENERATE_CONCURRENCY', 16))
+ADMISSION_QUEUE_SIZE = int(os.getenv('ADMISSION_QUEUE_SIZE', 32))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv('ADMISSION_QUEUE_TIMEOUT_SECONDS', 5))
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', 64))
+RATE_LIMIT_PER_SECOND = float(os.getenv('RATE_LIMIT_PER_SECOND', 0))
+RATE_LIMIT_BURST = float(os.getenv('RATE_LIMIT_BURST', 10))
+
+admission = make_admission_controller(ADMISSION_ENCODE_CONCURRENCY, ADMISSION_RETRIEVE_CONCURRENCY,
+                                      ADMISSION_GENERATE_CONCURRENCY, ADMISSION_QUEUE_SIZE,
+                                      ADMISSION_QUEUE_TIMEOUT_SECONDS, ADMISSION_MAX_IN_FLIGHT,
+                                      RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+
 chatbot = None
+db_watcher = None
 
 @app.route('/')
 def home():
@@ -30,28 +95,51 @@ def home():
 
 @app.route('/chat', methods=['POST'])
 def chat():
-    global chatbot
+    global chatbot, db_watcher
     
     try:
         data = request.json
         user_message = data.get('message', '')
+        session_id = data.get('session_id')
         
         if not user_message:
             return jsonify({'error': 'No message provided'}), 400
         
-        # Initialize chatbot if not already done
-        if chatbot is None:
-            chatbot = RAGChatbot("machdatum_rag_db.json", GEMINI_API_KEY)
+        # Turn requests away before doing any work when this client or the server is over its limit
+        with admission.request(request.remote_addr) if admission is not None else nullcontext():
+            # Initialize chatbot if not already done
+            if chatbot is None:
+                chatbot = RAGChatbot(DB_SOURCE, GEMINI_API_KEY,
+                                     llm_deadline=LLM_DEADLINE_SECONDS,
+                                     hedge_after=LLM_HEDGE_AFTER_SECONDS,
+                                     reranker=make_reranker(RERANK_SCORER, RERANK_BUDGET_MS),
+                                     candidate_pool=RERANK_CANDIDATE_POOL,
+                                     semantic_cache=SemanticCache(SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD)
+                                     if SEMANTIC_CACHE_THRESHOLD is not None else None,
+                                     session_store=make_session_store(SESSION_STORE, SESSION_TTL_SECONDS,
+                                                                      SESSION_MAX, SESSION_DB_PATH),
+                                     answer_table=AnswerTable(ANSWER_TABLE_PATH, ANSWER_TABLE_THRESHOLD)
+                                     if ANSWER_TABLE_PATH else None,
+                                     searcher=make_searcher(SEARCH_THREADS, SEARCH_BLOCK_ROWS),
+                                     encoder_tolerance=ENCODER_TOLERANCE,
+                                     admission=admission,
+                                     **serving_options_from_env())
+                if DB_WATCH_INTERVAL > 0:
+                    db_watcher = DatabaseWatcher(DB_SOURCE, chatbot.reload_database,
+                                                 interval=DB_WATCH_INTERVAL).start()
         
-        # Get response
-        result = chatbot.chat(user_message)
+            # Get response
+            result = chatbot.chat(user_message, session_id=session_id)
         
         return jsonify({
             'response': result['response'],
             'context_count': len(result['context_used']),
-            'similarity_scores': result['similarity_scores']
+            'similarity_scores': result['similarity_scores'],
+            'served_by': result['served_by']
         })
         
+    except Overloaded as e:
+        return jsonify({'error': e.reason}), e.status, {'Retry-After': e.retry_after_header()}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -59,5 +147,39 @@ def chat():
 def health():
     return jsonify({'status': 'healthy'})
 
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'error': 'Forbidden'}), 403
+    if chatbot is None:
+        return jsonify({'status': 'not_loaded'})
+    
+    try:
+        # In-flight requests finish on the previous index while this one is built.
+        # Go through the watcher (when running) so it does not load the same file again
+        if db_watcher is not None:
+            reloaded = db_watcher.reload()
+        else:
+            reloaded = chatbot.reload_database()
+        return jsonify({'status': 'reloaded' if reloaded else 'unchanged', 'version': chatbot.index.version,
+                        'entries': len(chatbot.index.entries)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/stats')
+def stats():
+    result = {'slo_mode': False}
+    if chatbot is not None and chatbot.slo_generator is not None:
+        result.update({'slo_mode': True, **chatbot.slo_generator.stats()})
+    if chatbot is not None and chatbot.semantic_cache is not None:
+        result['semantic_cache'] = chatbot.semantic_cache.stats()
+    if chatbot is not None and chatbot.session_store is not None:
+        result['sessions'] = chatbot.session_store.stats()
+    if chatbot is not None and chatbot.answer_table is not None:
+        result['answer_table'] = chatbot.answer_table.stats()
+    if admission is not None:
+        result['admission'] = admission.stats()
+    return jsonify(result)
+
 if __name__ == '__main__':
     app.run(debug=FLASK_DEBUG, host='0.0.0.0', port=FLASK_PORT)
\ No newline at end of file
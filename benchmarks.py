@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the MachDatum RAG retrieval pipeline
+
+Usage:
+    python benchmarks.py rerank [--scorer lexical] [--pools 3,10,20,50] [--budget-ms 50]
+    python benchmarks.py workers [--workers 1,2,4] [--modes baseline,shared,shared+encoder]
+    python benchmarks.py search [--rows 1000000] [--threads 1,2,4,8]
+    python benchmarks.py admission [--url http://127.0.0.1:5000] [--rates 5,20,50] [--duration 10]
+    python benchmarks.py encoders [--encoders sentence-transformers,onnx,onnx-int8,hash]
+"""
+
+import argparse
+import json
+import multiprocessing
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from retrieval import build_embedding_matrix, find_similar
+
+DB_PATH = "machdatum_rag_db.json"
+
+BENCHMARK_QUERIES = [
+    "What services does MachDatum provide?",
+    "How can I contact MachDatum?",
+    "Tell me about the company",
+    "What technologies do you work with?",
+    "Who are the team members?",
+    "What is the email address?",
+    "Do you offer data engineering consulting?",
+    "Which industries do you work with?",
+    "Where is the office located?",
+    "What is MachDatum's mission?"
+]
+
+def load_entries(db_path: str):
+    """Load knowledge base entries with numpy embeddings"""
+    with open(db_path, 'r', encoding='utf-8') as f:
+        database = json.load(f)
+    for entry in database['knowledge_base']:
+        entry['embedding'] = np.array(entry['embedding'])
+    return database['knowledge_base']
+
+def encode_queries(queries):
+    """Encode benchmark queries with the configured encoder (ENCODER)"""
+    from encoders import encoder_from_env
+    return encoder_from_env().encode(queries)
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+def benchmark_rerank(args):
+    """Latency/quality trade-off of re-ranking per candidate-pool size
+
+    Quality is recall@k against an exhaustive re-rank of the whole knowledge base
+    with the same scorer and no time budget.
+    """
+    from reranker import Reranker, SCORERS
+
+    entries = load_entries(args.db)
+    matrix = build_embedding_matrix(entries)
+    query_embeddings = encode_queries(BENCHMARK_QUERIES)
+    scorer = SCORERS[args.scorer]()
+
+    def ids(results):
+        return [result['entry']['id'] for result in results]
+
+    # Reference ranking: every entry re-ranked, unlimited budget, no cache
+    reference = {}
+    for query, embedding in zip(BENCHMARK_QUERIES, query_embeddings):
+        exhaustive = Reranker(scorer, budget_ms=float('inf'), cache_size=0)
+        reference[query] = set(ids(find_similar(matrix, entries, embedding, query, top_k=args.top_k,
+                                                similarity_threshold=-1.0, reranker=exhaustive,
+                                                candidate_pool=len(entries))))
+
+    print(f"Entries: {len(entries)}  scorer: {args.scorer}  top_k: {args.top_k}  budget: {args.budget_ms}ms")
+    print(f"{'pool':>6} {'p50 ms':>9} {'p95 ms':>9} {'cached p50':>11} {'recall@k':>9}")
+
+    pools = [0] + [int(pool) for pool in args.pools.split(',')]
+    for pool in pools:
+        reranker = Reranker(scorer, budget_ms=args.budget_ms) if pool else None
+        cold, warm, recalls = [], [], []
+        for _ in range(args.repeat):
+            if reranker is not None:
+                reranker.clear_cache()
+            for query, embedding in zip(BENCHMARK_QUERIES, query_embeddings):
+                start = time.perf_counter()
+                results = find_similar(matrix, entries, embedding, query, top_k=args.top_k,
+                                       similarity_threshold=-1.0, reranker=reranker, candidate_pool=pool)
+                cold.append((time.perf_counter() - start) * 1000)
+                recalls.append(len(set(ids(results)) & reference[query]) / max(len(reference[query]), 1))
+
+                # Same query again: re-rank scores come from the cache
+                start = time.perf_counter()
+                find_similar(matrix, entries, embedding, query, top_k=args.top_k,
+                             similarity_threshold=-1.0, reranker=reranker, candidate_pool=pool)
+                warm.append((time.perf_counter() - start) * 1000)
+
+        label = str(pool) if pool else "none"
+        print(f"{label:>6} {percentile(cold, 50):>9.3f} {percentile(cold, 95):>9.3f} "
+              f"{percentile(warm, 50):>11.3f} {np.mean(recalls):>9.3f}")
+
+def post_chat(port: int, message: str) -> bool:
+    request = urllib.request.Request(f"http://127.0.0.1:{port}/chat", data=json.dumps({'message': message}).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return response.status == 200
+    except Exception:
+        return False
+
+def run_load(port: int, clients: int, duration: float) -> float:
+    """Closed-loop load: `clients` threads posting /chat for `duration` seconds; returns req/s"""
+    completed = [0] * clients
+    stop_at = time.monotonic() + duration
+
+    def client(slot):
+        i = slot
+        while time.monotonic() < stop_at:
+            if post_chat(port, BENCHMARK_QUERIES[i % len(BENCHMARK_QUERIES)]):
+                completed[slot] += 1
+            i += 1
+
+    threads = [threading.Thread(target=client, args=(slot,)) for slot in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(completed) / duration
+
+def benchmark_workers(args):
+    """Resident memory per worker and throughput as the worker count grows
+
+    Modes: baseline (each worker parses the JSON and loads its own model), shared
+    (memory-mapped matrix) and shared+encoder (plus one central encoder process).
+    PSS divides shared pages between the processes mapping them.
+    """
+    from serve_shared import start_server, stop_server, process_memory
+
+    print(f"{'mode':>15} {'workers':>8} {'req/s':>8} {'RSS/worker MB':>14} {'PSS/worker MB':>14} {'total PSS MB':>13}")
+    for mode in args.modes.split(','):
+        for workers in [int(count) for count in args.workers.split(',')]:
+            handles = start_server(workers, host='127.0.0.1', port=args.port, app_module=args.app,
+                                   shared=mode != 'baseline', central_encoder=mode == 'shared+encoder',
+                                   db_path=args.db, quiet=True)
+            try:
+                # Warm up: enough concurrent requests to initialize every worker's chatbot
+                run_load(args.port, clients=workers * 2, duration=args.warmup)
+                throughput = run_load(args.port, clients=args.clients, duration=args.duration)
+
+                memory = [process_memory(process.pid) for process in handles['workers']]
+                rss = [value for value, _ in memory if value is not None]
+                pss = [value for _, value in memory if value is not None]
+                if handles['encoder'] is not None:
+                    pss.append(process_memory(handles['encoder'].pid)[1] or 0.0)
+                print(f"{mode:>15} {workers:>8} {throughput:>8.1f} {np.mean(rss) if rss else 0:>14.1f} "
+                      f"{np.mean(pss[:workers]) if pss else 0:>14.1f} {sum(pss):>13.1f}")
+            finally:
+                stop_server(handles)
+
+def benchmark_search(args):
+    """Exact top-k search latency vs thread count on a synthetic matrix
+
+    The knowledge base is far too small to show scaling, so a random normalized
+    matrix of --rows x --dim stands in; results are checked against the
+    single-threaded top_candidates.
+    """
+    from parallel_search import BlockedSearcher
+    from retrieval import top_candidates
+
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((args.rows, args.dim), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+    def timed(search):
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            search(matrix, query, args.top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+        return latencies
+
+    def peak_kb(search):
+        # Python-side allocations (NumPy arrays included) during one search
+        tracemalloc.start()
+        search(matrix, queries[0], args.top_k)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak / 1024
+
+    reference = [top_candidates(matrix, query, args.top_k)[0] for query in queries]
+    baseline = percentile(timed(top_candidates), 50)
+
+    print(f"Matrix: {args.rows} x {args.dim} ({matrix.nbytes / 2**20:.0f} MB)  top_k: {args.top_k}  "
+          f"block: {args.block_rows} rows")
+    print(f"{'threads':>8} {'p50 ms':>9} {'p95 ms':>9} {'speedup':>8} {'peak KB':>9} {'exact':>6}")
+    print(f"{'numpy':>8} {baseline:>9.2f} {'':>9} {1.0:>8.2f} {peak_kb(top_candidates):>9.0f} {'yes':>6}")
+    for threads in [int(count) for count in args.threads.split(',')]:
+        # threads=1 is the blocked kernel on the calling thread, not the NumPy scan above
+        searcher = BlockedSearcher(threads, args.block_rows, min_parallel_rows=0)
+        exact = all(np.array_equal(searcher.top_candidates(matrix, query, args.top_k)[0], expected)
+                    for query, expected in zip(queries, reference))
+        latencies = timed(searcher.top_candidates)
+        peak = peak_kb(searcher.top_candidates)
+        searcher.close()
+        print(f"{threads:>8} {percentile(latencies, 50):>9.2f} {percentile(latencies, 95):>9.2f} "
+              f"{baseline / percentile(latencies, 50):>8.2f} {peak:>9.0f} {'yes' if exact else 'NO':>6}")
+
+def timed_chat(url: str, message: str):
+    """POST /chat once; returns (status, latency ms, Retry-After header or None)"""
+    request = urllib.request.Request(f"{url}/chat", data=json.dumps({'message': message}).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            status, retry_after = response.status, None
+    except urllib.error.HTTPError as e:
+        status, retry_after = e.code, e.headers.get('Retry-After')
+    except Exception:
+        status, retry_after = 0, None
+    return status, (time.perf_counter() - start) * 1000, retry_after
+
+def benchmark_admission(args):
+    """Open-loop load against a running app to check admission control
+
+    Requests are sent at a fixed rate regardless of how fast they complete, so a
+    server past capacity shows up as 429/503 rejections with Retry-After rather than
+    as ever-growing latency. All requests come from one client address, so a per-client
+    rate limit applies to the whole run.
+    """
+    print(f"Target: {args.url}  duration: {args.duration}s per rate")
+    print(f"{'rate/s':>7} {'sent':>6} {'200':>6} {'429':>6} {'503':>6} {'other':>6} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'Retry-After':>12}")
+    for rate in [float(value) for value in args.rates.split(',')]:
+        total = int(rate * args.duration)
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=args.max_open) as executor:
+            futures = []
+            for i in range(total):
+                # Fixed schedule: sleep until this request's send time
+                delay = start + i / rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(executor.submit(timed_chat, args.url, BENCHMARK_QUERIES[i % len(BENCHMARK_QUERIES)]))
+            results = [future.result() for future in futures]
+
+        statuses = Counter(status for status, _, _ in results)
+        accepted = [latency for status, latency, _ in results if status == 200]
+        retry_after = sorted({value for _, _, value in results if value is not None}, key=int)
+        other = total - statuses[200] - statuses[429] - statuses[503]
+        print(f"{rate:>7.1f} {total:>6} {statuses[200]:>6} {statuses[429]:>6} {statuses[503]:>6} {other:>6} "
+              f"{percentile(accepted, 50):>9.1f} {percentile(accepted, 95):>9.1f} {percentile(accepted, 99):>9.1f} "
+              f"{','.join(retry_after) or '-':>12}")
+
+    try:
+        with urllib.request.urlopen(f"{args.url}/stats", timeout=10) as response:
+            print(json.dumps(json.load(response).get('admission', {}), indent=2))
+    except Exception as e:
+        print(f"Could not read /stats: {e}")
+
+def _measure_encoder(name: str, db_path: str, repeat: int):
+    """Runs in a fresh process so startup includes the encoder's imports"""
+    start = time.perf_counter()
+    from encoders import encoder_from_env, lowest_agreement
+    encoder = encoder_from_env(name)
+    encoder.encode(BENCHMARK_QUERIES[:1])  # First call often initializes lazily
+    startup = time.perf_counter() - start
+
+    single = []
+    for _ in range(repeat):
+        for query in BENCHMARK_QUERIES:
+            start = time.perf_counter()
+            encoder.encode([query])
+            single.append((time.perf_counter() - start) * 1000)
+
+    from retrieval import KnowledgeIndex
+    index = KnowledgeIndex.load(db_path)
+    contents = [entry['content'] for entry in index.entries]
+    start = time.perf_counter()
+    encoder.encode(contents)
+    throughput = len(contents) / (time.perf_counter() - start)
+
+    try:
+        agreement = f"{lowest_agreement(encoder, index, sample_size=len(contents)):.4f}"
+    except ValueError:
+        agreement = "dim mismatch"
+    return startup, percentile(single, 50), percentile(single, 95), throughput, agreement
+
+def benchmark_encoders(args):
+    """Startup time, per-query latency, batch throughput and agreement with the stored vectors
+
+    Each encoder is measured in a new process. Agreement is the lowest cosine between
+    a re-encoded entry and its stored vector (1.0 = identical).
+    """
+    context = multiprocessing.get_context('spawn')
+    print(f"{'encoder':>22} {'startup s':>10} {'p50 ms':>9} {'p95 ms':>9} {'batch/s':>9} {'min cosine':>12}")
+    for name in args.encoders.split(','):
+        with context.Pool(1) as pool:
+            try:
+                startup, p50, p95, throughput, agreement = pool.apply(_measure_encoder, (name, args.db, args.repeat))
+            except Exception as e:
+                print(f"{name:>22} unavailable: {e}")
+                continue
+        print(f"{name:>22} {startup:>10.2f} {p50:>9.2f} {p95:>9.2f} {throughput:>9.1f} {agreement:>12}")
+
+def main():
+    parser = argparse.ArgumentParser(description="MachDatum RAG benchmarks")
+    parser.add_argument('--db', default=DB_PATH, help="Path to the RAG database")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    rerank = subparsers.add_parser('rerank', help="Re-ranking latency/quality per candidate-pool size")
+    rerank.add_argument('--scorer', default='lexical', help="lexical, linear or cross-encoder")
+    rerank.add_argument('--pools', default='3,10,20,50', help="Comma-separated candidate-pool sizes")
+    rerank.add_argument('--budget-ms', type=float, default=50.0)
+    rerank.add_argument('--top-k', type=int, default=3)
+    rerank.add_argument('--repeat', type=int, default=5)
+    rerank.set_defaults(func=benchmark_rerank)
+
+    workers = subparsers.add_parser('workers', help="Memory per worker and throughput vs worker count")
+    workers.add_argument('--workers', default='1,2,4', help="Comma-separated worker counts")
+    workers.add_argument('--modes', default='baseline,shared,shared+encoder')
+    workers.add_argument('--app', default='simple_web_app', help="Flask app module served by the workers")
+    workers.add_argument('--port', type=int, default=5055)
+    workers.add_argument('--clients', type=int, default=8)
+    workers.add_argument('--duration', type=float, default=10.0)
+    workers.add_argument('--warmup', type=float, default=5.0)
+    workers.set_defaults(func=benchmark_workers)
+
+    search = subparsers.add_parser('search', help="Exact search latency vs thread count")
+    search.add_argument('--rows', type=int, default=1000000)
+    search.add_argument('--dim', type=int, default=384)
+    search.add_argument('--threads', default='1,2,4,8', help="Comma-separated thread counts")
+    search.add_argument('--block-rows', type=int, default=4096)
+    search.add_argument('--top-k', type=int, default=20)
+    search.add_argument('--queries', type=int, default=50)
+    search.set_defaults(func=benchmark_search)
+
+    admission = subparsers.add_parser('admission', help="Open-loop load to exercise admission control")
+    admission.add_argument('--url', default='http://127.0.0.1:5000', help="Running app.py server")
+    admission.add_argument('--rates', default='5,20,50', help="Comma-separated request rates (req/s)")
+    admission.add_argument('--duration', type=float, default=10.0)
+    admission.add_argument('--max-open', type=int, default=512, help="Maximum concurrent open requests")
+    admission.set_defaults(func=benchmark_admission)
+
+    encoders = subparsers.add_parser('encoders', help="Encoder startup, latency and agreement with stored vectors")
+    encoders.add_argument('--encoders', default='sentence-transformers,onnx,onnx-int8,hash')
+    encoders.add_argument('--repeat', type=int, default=5)
+    encoders.set_defaults(func=benchmark_encoders)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import threading
+import numpy as np
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from retrieval import KnowledgeIndex, find_similar
+from reranker import Reranker
+from encoders import encoder_from_env, check_compatibility
+from session_store import is_followup
+from answer_table import AnswerTable, SERVED_PRECOMPUTED
+
+class KnowledgeBaseChatbot:
+    def __init__(self, db_path: str, reranker: Optional[Reranker] = None, candidate_pool: int = 20,
+                 encoder=None, index_loader: Optional[Callable[[str], KnowledgeIndex]] = None,
+                 session_store=None, answer_table: Optional[AnswerTable] = None,
+                 searcher=None, encoder_tolerance: Optional[float] = None):
+        """Knowledge base, retrieval and sessions shared by RAGChatbot and SimpleRAGChatbot
+
+        The database is loaded into a read-only KnowledgeIndex snapshot. A reload builds
+        the new snapshot first and then swaps the single `index` reference, so requests
+        already running finish on the old one. Subclasses set their own caches before
+        calling this, since it loads the database.
+        """
+        if encoder is None:
+            encoder = encoder_from_env()
+        self.model = encoder
+        self.encoder_tolerance = encoder_tolerance
+        self.index_loader = index_loader or KnowledgeIndex.load
+        self.reranker = reranker
+        self.candidate_pool = candidate_pool
+        self.session_store = session_store
+        self.answer_table = answer_table
+        self.searcher = searcher
+
+        # Load database
+        self._reload_lock = threading.Lock()
+        self._load_sequence = 0  # Loads started
+        self._swapped_sequence = 0  # Newest load swapped in
+        self.index = None
+        self.load_database(db_path)
+
+    def load_database(self, db_path: str) -> bool:
+        """Load the RAG database and swap it in for new requests; False if nothing was swapped"""
+        with self._reload_lock:
+            self._load_sequence += 1
+            sequence = self._load_sequence
+
+        # Parse and build the index before taking the lock; requests keep using the old one
+        index = self.index_loader(db_path)
+
+        # A database built with a different model would silently return poor matches
+        if self.encoder_tolerance is not None:
+            check_compatibility(self.model, index, self.encoder_tolerance)
+
+        with self._reload_lock:
+            # Overlapping reloads: one that started later has already swapped in a newer snapshot
+            if sequence < self._swapped_sequence:
+                print(f"Skipping database version {index.version}: a newer load finished first")
+                return False
+            current = self.index
+            if current is not None and current.db_path == index.db_path and current.version == index.version:
+                return False
+            self._swapped_sequence = sequence
+            self.index = index
+            self.db_path = db_path
+            self._clear_caches(index)
+
+        print(f"Loaded database with {len(index.entries)} entries")
+
+        # Precomputed answers belong to one database version; rebuild them for the new one
+        if self.answer_table is not None:
+            self.answer_table.refresh(self)
+        return True
+
+    def reload_database(self) -> bool:
+        """Rebuild the index from the database file (called by the watcher or /admin/reload)"""
+        return self.load_database(self.db_path)
+
+    @property
+    def database(self) -> Dict[str, Any]:
+        return self.index.database
+
+    @property
+    def embedding_matrix(self) -> np.ndarray:
+        return self.index.embedding_matrix
+
+    def find_similar_context(self, query: str, top_k: int = 3, similarity_threshold: float = 0.3,
+                             query_embedding: Optional[np.ndarray] = None,
+                             index: Optional[KnowledgeIndex] = None) -> List[Dict[Any, Any]]:
+        """Find similar context from the database"""
+
+        # Read the current snapshot once; a concurrent reload cannot change it mid-search
+        if index is None:
+            index = self.index
+
+        # Generate embedding for the query
+        if query_embedding is None:
+            query_embedding = self.model.encode([query])[0]
+
+        # Cosine top-N from the embedding matrix, then re-rank down to top_k
+        return find_similar(index.embedding_matrix, index.entries, query_embedding, query,
+                            top_k=top_k, similarity_threshold=similarity_threshold,
+                            reranker=self.reranker, candidate_pool=self.candidate_pool, version=index.version,
+                            searcher=self.searcher)
+
+    def _clear_caches(self, index: KnowledgeIndex):
+        """Drop cache entries for the old snapshot (called under the reload lock when swapping)"""
+        # Caches are keyed by version
+        if self.reranker is not None:
+            self.reranker.clear_cache()
+
+    def _begin_turn(self, user_input: str, session_id: Optional[str], use_precomputed: bool
+                    ) -> Tuple[KnowledgeIndex, Any, Optional[AnswerTable], Optional[Dict[str, Any]]]:
+        """Pin the snapshot, load the session and try an exact precomputed answer
+
+        Returns (index, session, answer_table, result); result is set when the answer
+        table already answered, and answer_table is None when it must not be used.
+        """
+        # Pin the current database snapshot for the whole request
+        index = self.index
+
+        session = None
+        if self.session_store is not None and session_id:
+            session = self.session_store.get(session_id)
+
+        # Exact matches in the precomputed answer table are served without encoding
+        answer_table = self.answer_table if use_precomputed else None
+        if answer_table is not None and not (session is not None and session.turns and is_followup(user_input)):
+            hit = answer_table.lookup_text(user_input, index.version)
+            if hit is not None:
+                return index, session, answer_table, self._record_turn(
+                    session_id, session, user_input, hit['embedding'], hit['context_ids'],
+                    dict(hit['result'], served_by=SERVED_PRECOMPUTED))
+        return index, session, answer_table, None
+
+    def _precomputed_rewording(self, answer_table: Optional[AnswerTable], index: KnowledgeIndex, session_id, session,
+                               user_input: str, query_embedding) -> Optional[Dict[str, Any]]:
+        """Serve a near-exact rewording of a precomputed question, or None"""
+        if answer_table is None:
+            return None
+        hit = answer_table.lookup_embedding(query_embedding, index.version)
+        if hit is None:
+            return None
+        return self._record_turn(session_id, session, user_input, query_embedding, hit['context_ids'],
+                                 dict(hit['result'], served_by=SERVED_PRECOMPUTED))
+
+    def _record_turn(self, session_id, session, user_input, query_embedding, context_ids, result):
+        """Append this turn to the conversation session (if any) and return the result with its context ids"""
+        if session is not None:
+            session.add_turn(user_input, query_embedding, context_ids, result['response'])
+            self.session_store.put(session_id, session)
+        return dict(result, context_ids=list(context_ids))
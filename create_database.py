@@ -1,8 +1,11 @@
 import docx
 import json
+import os
 import re
-from sentence_transformers import SentenceTransformer
+import sys
 import numpy as np
+from encoders import encoder_from_env
+from knowledge_store import write_sqlite_store
 
 def extract_text_from_docx(file_path):
     """Extract text from DOCX file"""
@@ -51,8 +54,8 @@ def categorize_content(text):
     else:
         return 'general'
 
-def create_rag_database():
-    """Create RAG database from the DOCX file"""
+def create_rag_database(sqlite_path=None):
+    """Create RAG database from the DOCX file (and a SQLite knowledge store if sqlite_path is given)"""
     
     # Extract text from document
     document_path = "MachDatum Details.docx"
@@ -61,13 +64,14 @@ def create_rag_database():
     # Create chunks
     chunks = create_chunks(text_list, chunk_size=300)
     
-    # Initialize sentence transformer for embeddings
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+    # Initialize the encoder for embeddings (ENCODER selects it; queries must use the same one)
+    model = encoder_from_env()
     
     # Create database entries
     database = {
         "company_name": "MachDatum",
         "website": "https://www.machdatum.com/",
+        "encoder": model.name,
         "knowledge_base": []
     }
     
@@ -92,12 +96,19 @@ def create_rag_database():
         
         database["knowledge_base"].append(entry)
     
-    # Save to JSON file
-    with open('machdatum_rag_db.json', 'w', encoding='utf-8') as f:
+    # Save to JSON file; write a temp file and rename so a running server never reads a partial database
+    with open('machdatum_rag_db.json.tmp', 'w', encoding='utf-8') as f:
         json.dump(database, f, indent=2, ensure_ascii=False)
+    os.replace('machdatum_rag_db.json.tmp', 'machdatum_rag_db.json')
+    
+    # Paged store for large knowledge bases: content in SQLite, embeddings in a matrix file
+    if sqlite_path:
+        write_sqlite_store(database, sqlite_path)
     
     print(f"Created RAG database with {len(database['knowledge_base'])} entries")
     return database
 
 if __name__ == "__main__":
-    create_rag_database()
\ No newline at end of file
+    # --sqlite also writes machdatum_rag_db.sqlite (or set KNOWLEDGE_STORE=sqlite)
+    use_sqlite = '--sqlite' in sys.argv or os.getenv('KNOWLEDGE_STORE') == 'sqlite'
+    create_rag_database('machdatum_rag_db.sqlite' if use_sqlite else None)
\ No newline at end of file
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Central query-encoder process for multi-worker serving
+
+One process loads the encoder (ENCODER, see encoders.py) and answers encode requests
+over a local socket, so web workers do not each load (and hold in memory) their own copy.
+
+Usage:
+    python encoder_service.py --address /tmp/machdatum-encoder.sock
+"""
+
+import argparse
+import os
+import threading
+from multiprocessing.connection import Listener, Client
+
+DEFAULT_ADDRESS = "/tmp/machdatum-encoder.sock"
+INFO_REQUEST = None  # Not a (sentences, kwargs) pair, so it can never collide with an encode request
+
+class RemoteEncoder:
+    """Drop-in for SentenceTransformer.encode that calls the encoder process
+
+    name and dimension are those of the service's encoder, asked once on connect.
+    """
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, authkey: bytes = None):
+        self.address = address
+        self.authkey = authkey
+        self._local = threading.local()  # Connections are not thread-safe; one per thread
+        info = self._request(INFO_REQUEST)
+        self.name = info['name']
+        self.dimension = info['dimension']
+
+    def encode(self, sentences, **kwargs):
+        return self._request((sentences, kwargs))
+
+    def _request(self, message):
+        for attempt in range(2):
+            connection = getattr(self._local, 'connection', None)
+            if connection is None:
+                connection = Client(self.address, authkey=self.authkey)
+                self._local.connection = connection
+
+            try:
+                connection.send(message)
+                status, payload = connection.recv()
+                break
+            except (EOFError, OSError):
+                # Encoder restarted: reconnect once
+                self._local.connection = None
+                if attempt:
+                    raise
+
+        if status != "ok":
+            raise RuntimeError(f"Encoder service error: {payload}")
+        return payload
+
+def serve(address: str = DEFAULT_ADDRESS, authkey: bytes = None, encoder_name: str = None):
+    """Load the encoder once and serve encode requests, one thread per client connection"""
+    from encoders import encoder_from_env
+    model = encoder_from_env(encoder_name)
+    info = {'name': model.name, 'dimension': model.dimension}
+
+    if isinstance(address, str) and os.path.exists(address):
+        os.remove(address)  # Stale socket from a previous run
+
+    listener = Listener(address, authkey=authkey)
+    print(f"Encoder service listening on {address}")
+
+    def handle(connection):
+        with connection:
+            while True:
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    return
+                if message is INFO_REQUEST:
+                    connection.send(("ok", info))
+                    continue
+                try:
+                    sentences, kwargs = message
+                    connection.send(("ok", model.encode(sentences, **kwargs)))
+                except Exception as e:
+                    connection.send(("error", str(e)))
+
+    while True:
+        connection = listener.accept()
+        threading.Thread(target=handle, args=(connection,), daemon=True).start()
+
+def main():
+    parser = argparse.ArgumentParser(description="MachDatum query-encoder service")
+    parser.add_argument('--address', default=os.getenv('ENCODER_ADDRESS', DEFAULT_ADDRESS))
+    parser.add_argument('--encoder', help="Encoder name (default: ENCODER or sentence-transformers)")
+    args = parser.parse_args()
+
+    authkey = os.getenv('ENCODER_AUTHKEY')
+    serve(args.address, authkey.encode() if authkey else None, args.encoder)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Sentence encoders for the knowledge base and queries
+
+Every encoder has `name`, `dimension` and `encode(sentences)`, which returns one
+L2-normalized float32 row per sentence (a single vector for a str), like
+SentenceTransformer.encode. Choose one with ENCODER:
+
+    sentence-transformers  the PyTorch model (default)
+    onnx / onnx-int8       the same model exported to ONNX Runtime (fp32 / int8 dynamic-quantized)
+    hash                   deterministic hashed bag of words, for offline tests (no model)
+
+Usage (export the ONNX model once):
+    python encoders.py export-onnx [--model all-MiniLM-L6-v2] [--out onnx/all-MiniLM-L6-v2]
+"""
+
+import argparse
+import hashlib
+import os
+import re
+from typing import Optional
+
+import numpy as np
+
+DEFAULT_MODEL = 'all-MiniLM-L6-v2'
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+class SentenceTransformerEncoder:
+    """The sentence-transformers model in PyTorch (what the stored vectors were built with)"""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL):
+        # Imported here so other encoders never load PyTorch
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        return self.model.encode(sentences, batch_size=batch_size, normalize_embeddings=True, **kwargs)
+
+class ONNXEncoder:
+    """The exported transformer run with ONNX Runtime, plus mean pooling and normalization
+
+    Needs onnxruntime and tokenizers only; the model directory comes from
+    `python encoders.py export-onnx`.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str, quantized: bool = False, max_length: int = 256, threads: int = 0):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_file = "model.int8.onnx" if quantized else "model.onnx"
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads  # 0 lets ONNX Runtime decide
+        self.session = onnxruntime.InferenceSession(os.path.join(model_dir, model_file), options,
+                                                    providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        self.name = "onnx-int8" if quantized else "onnx"
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        single = isinstance(sentences, str)
+        sentences = [sentences] if single else list(sentences)
+
+        rows = []
+        for start in range(0, len(sentences), batch_size):
+            encodings = self.tokenizer.encode_batch(sentences[start:start + batch_size])
+            feed = {
+                'input_ids': np.asarray([encoding.ids for encoding in encodings], dtype=np.int64),
+                'attention_mask': np.asarray([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+                'token_type_ids': np.asarray([encoding.type_ids for encoding in encodings], dtype=np.int64)
+            }
+            hidden = self.session.run(None, {name: value for name, value in feed.items() if name in self.input_names})[0]
+
+            # Mean over real tokens, as the sentence-transformers pooling layer does
+            mask = feed['attention_mask'][..., None].astype(np.float32)
+            rows.append((hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+
+        embeddings = _normalize_rows(np.vstack(rows)) if rows else np.zeros((0, self.dimension), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+class HashEncoder:
+    """Deterministic signed hashing of word unigrams and bigrams; no model, for offline tests
+
+    Vectors are not comparable with the transformer's, so a database used with this
+    encoder must be built with it too (ENCODER=hash python create_database.py).
+    """
+
+    name = "hash"
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def encode(self, sentences, **kwargs):
+        single = isinstance(sentences, str)
+        sentences = [sentences] if single else list(sentences)
+
+        embeddings = np.zeros((len(sentences), self.dimension), dtype=np.float32)
+        for row, sentence in enumerate(sentences):
+            tokens = TOKEN_PATTERN.findall(sentence.lower())
+            for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+                digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], 'little') % self.dimension
+                embeddings[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+
+        embeddings = _normalize_rows(embeddings)
+        return embeddings[0] if single else embeddings
+
+ENCODERS = {
+    'sentence-transformers': lambda model_name, model_dir: SentenceTransformerEncoder(model_name),
+    'onnx': lambda model_name, model_dir: ONNXEncoder(model_dir or os.path.join("onnx", model_name)),
+    'onnx-int8': lambda model_name, model_dir: ONNXEncoder(model_dir or os.path.join("onnx", model_name),
+                                                           quantized=True),
+    'hash': lambda model_name, model_dir: HashEncoder()
+}
+
+def make_encoder(name: Optional[str] = None, model_name: str = DEFAULT_MODEL, model_dir: Optional[str] = None):
+    """Build an encoder by name (default 'sentence-transformers')"""
+    name = name or 'sentence-transformers'
+    if name not in ENCODERS:
+        raise ValueError(f"Unknown encoder '{name}'. Choose from: {', '.join(ENCODERS)}")
+    return ENCODERS[name](model_name, model_dir)
+
+def encoder_from_env(name: Optional[str] = None):
+    """The encoder selected by ENCODER (or name), ENCODER_MODEL and ENCODER_MODEL_DIR"""
+    return make_encoder(name or os.getenv('ENCODER'), os.getenv('ENCODER_MODEL', DEFAULT_MODEL),
+                        os.getenv('ENCODER_MODEL_DIR'))
+
+def lowest_agreement(encoder, index, sample_size: int = 16) -> float:
+    """Re-encode a sample of stored entries; the lowest cosine between fresh and stored vectors
+
+    All-zero stored rows are placeholders (e.g. ensure_database.py's fallback entry),
+    not encoder output, so they are left out; 1.0 if no real vector remains.
+    """
+    count = min(sample_size, len(index.entries))
+    if count == 0:
+        return 1.0
+    positions = np.unique(np.linspace(0, len(index.entries) - 1, count).astype(int))
+    stored = np.asarray(index.embedding_matrix[positions], dtype=np.float32)
+    real = np.any(stored != 0, axis=1)
+    positions, stored = positions[real].tolist(), stored[real]
+    count = len(positions)
+    if count == 0:
+        return 1.0
+    contents = [index.entries[position]['content'] for position in positions]
+
+    fresh = _normalize_rows(np.asarray(encoder.encode(contents), dtype=np.float32).reshape(count, -1))
+    if fresh.shape[1] != stored.shape[1]:
+        raise ValueError(f"Encoder produces {fresh.shape[1]}-dimensional vectors, "
+                         f"the database stores {stored.shape[1]}-dimensional ones")
+    return float(np.min(np.sum(fresh * stored, axis=1)))
+
+def check_compatibility(encoder, index, tolerance: float = 0.05, sample_size: int = 16) -> float:
+    """Raise ValueError unless the encoder reproduces the stored vectors to within 1 - tolerance cosine"""
+    lowest = lowest_agreement(encoder, index, sample_size)
+    if lowest < 1 - tolerance:
+        raise ValueError(f"Encoder {getattr(encoder, 'name', type(encoder).__name__)} does not match the stored "
+                         f"vectors (lowest cosine {lowest:.3f} < {1 - tolerance:.3f}); rebuild the database with it")
+    return lowest
+
+def export_onnx(model_name: str = DEFAULT_MODEL, out_dir: Optional[str] = None, quantize: bool = True) -> str:
+    """Export the transformer to ONNX (and an int8 dynamic-quantized copy) with its tokenizer"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    out_dir = out_dir or os.path.join("onnx", model_name)
+    hub_name = model_name if '/' in model_name else f"sentence-transformers/{model_name}"
+    tokenizer = AutoTokenizer.from_pretrained(hub_name)
+    model = AutoModel.from_pretrained(hub_name).eval()
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer.save_pretrained(out_dir)  # Writes tokenizer.json for the tokenizers library
+
+    inputs = tokenizer(["MachDatum provides data engineering services"], return_tensors='pt')
+    input_names = ['input_ids', 'attention_mask', 'token_type_ids']
+    model_path = os.path.join(out_dir, "model.onnx")
+    torch.onnx.export(
+        model, tuple(inputs[name] for name in input_names), model_path,
+        input_names=input_names, output_names=['last_hidden_state'],
+        dynamic_axes={name: {0: 'batch', 1: 'sequence'} for name in input_names + ['last_hidden_state']},
+        opset_version=14
+    )
+    print(f"Exported {model_name} to {model_path}")
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantized_path = os.path.join(out_dir, "model.int8.onnx")
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        print(f"Wrote int8 dynamic-quantized model to {quantized_path}")
+    return out_dir
+
+def main():
+    parser = argparse.ArgumentParser(description="MachDatum sentence encoders")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export = subparsers.add_parser('export-onnx', help="Export the model for the onnx/onnx-int8 encoders")
+    export.add_argument('--model', default=DEFAULT_MODEL)
+    export.add_argument('--out', help="Output directory (default onnx/<model>)")
+    export.add_argument('--no-quantize', action='store_true', help="Skip the int8 copy")
+    args = parser.parse_args()
+
+    export_onnx(args.model, args.out, quantize=not args.no_quantize)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import os
+import threading
+from typing import Callable, Optional
+
+from retrieval import database_version
+
+class DatabaseWatcher:
+    def __init__(self, db_path: str, on_change: Callable[[], None], interval: float = 5.0):
+        """Poll the database file and call on_change (in the watcher thread) when it changes
+
+        A change is only acted on once the file has the same size and mtime on two
+        consecutive polls, so a database that is still being written is not loaded.
+        If on_change raises, the error is printed and the old index stays in place.
+        """
+        self.db_path = db_path
+        self.on_change = on_change
+        self.interval = interval
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()  # Serializes polling reloads with reload() calls
+        self._loaded_version = self._current_version()
+
+    def start(self) -> 'DatabaseWatcher':
+        self._thread = threading.Thread(target=self._run, name="db-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def reload(self) -> bool:
+        """Reload now if the file differs from the loaded version (e.g. for /admin/reload)
+
+        Shares the loaded version with the poller, so the same file is not loaded twice
+        and two reloads never run at once. Returns False if there was nothing new;
+        raises if on_change fails.
+        """
+        with self._lock:
+            version = self._current_version()
+            if version is None or version == self._loaded_version:
+                return False
+            self.on_change()
+            self._loaded_version = version
+            return True
+
+    def _current_version(self) -> Optional[str]:
+        try:
+            return database_version(self.db_path)
+        except OSError:
+            return None  # Missing while being replaced
+
+    def _run(self):
+        pending = None
+        while not self._stop.wait(self.interval):
+            version = self._current_version()
+            if version is None or version == self._loaded_version:
+                pending = None
+                continue
+            if version != pending:
+                pending = version  # Wait one more poll for the file to settle
+                continue
+
+            print(f"Database {os.path.basename(self.db_path)} changed, reloading...")
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Database reload failed, keeping the previous version: {e}")
+            pending = None
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+SQLite-backed knowledge store with paged content access
+
+Entry content and metadata live in SQLite (keyed by the same `id` as the JSON
+database) and the normalized embeddings in a separate .npy matrix whose row number
+is the entry's `position`. Only the matrix is mapped at load time; content is
+fetched per query for the winning rows.
+
+The store path itself is a small pointer file naming the entries and matrix files
+of the current generation, which have a unique tag in their names and are never
+modified once published. A rebuild writes a new generation and renames a new
+pointer into place, so readers open the generation files immutable (no locking)
+and an index loaded before a hot reload keeps reading its own generation.
+
+Usage (convert an existing JSON database):
+    python knowledge_store.py machdatum_rag_db.json machdatum_rag_db.sqlite
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterable, Optional
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE entries (
+    position INTEGER PRIMARY KEY,
+    id INTEGER NOT NULL UNIQUE,
+    content TEXT NOT NULL,
+    category TEXT,
+    metadata TEXT
+);
+"""
+
+POINTER_SCHEMA = """
+CREATE TABLE info (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def write_sqlite_store(database: Dict[str, Any], store_path: str, batch_size: int = 10000) -> str:
+    """Write a database dict (entries with 'embedding') as a new store generation
+
+    Rows are inserted in bulk inside one transaction (WAL journal) into a new
+    versioned entries file next to a versioned matrix file; the pointer at
+    store_path is then replaced in one rename, so readers never see a partial store.
+    """
+    from retrieval import build_embedding_matrix
+
+    entries = database['knowledge_base']
+    out_dir = os.path.dirname(os.path.abspath(store_path))
+    base = os.path.splitext(os.path.basename(store_path))[0]
+
+    # Files of one generation share a tag; an index on an old generation keeps reading its own files
+    tag = uuid.uuid4().hex[:8]
+    embeddings_file = f"{base}.embeddings-{tag}.npy"
+    entries_file = f"{base}.entries-{tag}.sqlite"
+    np.save(os.path.join(out_dir, embeddings_file), build_embedding_matrix(entries))
+
+    connection = sqlite3.connect(os.path.join(out_dir, entries_file))
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        with connection:
+            rows = (
+                (position, entry['id'], entry['content'], entry.get('category'), json.dumps(entry.get('metadata', {})))
+                for position, entry in enumerate(entries)
+            )
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    connection.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?)", batch)
+                    batch = []
+            if batch:
+                connection.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?)", batch)
+
+        # Fold the WAL back in: the published file must be self-contained for immutable readers
+        connection.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        connection.close()
+
+    info = {key: value for key, value in database.items() if key != 'knowledge_base'}
+    info['entries_file'] = entries_file
+    info['embeddings_file'] = embeddings_file
+    temp_path = store_path + ".tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    connection = sqlite3.connect(temp_path)
+    try:
+        connection.executescript(POINTER_SCHEMA)
+        with connection:
+            connection.executemany("INSERT INTO info VALUES (?, ?)",
+                                   [(key, json.dumps(value)) for key, value in info.items()])
+    finally:
+        connection.close()
+    os.replace(temp_path, store_path)
+
+    _remove_stale_files(out_dir, f"{base}.entries-", ".sqlite", keep=entries_file)
+    _remove_stale_files(out_dir, f"{base}.embeddings-", ".npy", keep=embeddings_file)
+    print(f"Wrote SQLite knowledge store with {len(entries)} entries to {store_path}")
+    return store_path
+
+class SQLiteEntries:
+    """Read-only, lazily fetched sequence of knowledge base entries
+
+    Indexing by position runs a prepared SELECT; fetch() gets several rows in one
+    query. Recently used rows are kept in a small LRU cache. A fixed pool of
+    connections to the entries file is opened up front and handed to one thread at
+    a time, so prepared statements survive across request threads and the file stays
+    readable even after later rebuilds delete it.
+    """
+
+    def __init__(self, entries_path: str, cache_size: int = 1024, pool_size: int = 8):
+        self.entries_path = entries_path
+        self.cache_size = cache_size
+        self._pool = queue.Queue()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._length = None
+        # Never reopened by path: this generation may be deleted while the index is still in use
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection, waiting for one when all are in use"""
+        connection = self._pool.get()
+        try:
+            yield connection
+        finally:
+            self._pool.put(connection)
+
+    def _connect(self) -> sqlite3.Connection:
+        uri = f"file:{os.path.abspath(self.entries_path)}?immutable=1"
+        return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+    def __len__(self) -> int:
+        if self._length is None:
+            with self.connection() as connection:
+                self._length = connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return self._length
+
+    def __getitem__(self, position: int) -> Dict[str, Any]:
+        entries = self.fetch([position])
+        if not entries:
+            raise IndexError(position)
+        return entries[0]
+
+    def __iter__(self):
+        # A connection is borrowed per page, so an abandoned iterator never holds one
+        page_size = 1000
+        start = 0
+        while True:
+            with self.connection() as connection:
+                rows = connection.execute(
+                    "SELECT position, id, content, category, metadata FROM entries "
+                    "WHERE position >= ? ORDER BY position LIMIT ?", (start, page_size)
+                ).fetchall()
+            for row in rows:
+                yield self._to_entry(row)
+            if len(rows) < page_size:
+                return
+            start = rows[-1][0] + 1
+
+    def fetch(self, positions: Iterable[int]) -> List[Dict[str, Any]]:
+        """Entries for the given matrix rows, in the same order"""
+        positions = [int(position) for position in positions]
+        found = {}
+        with self._lock:
+            for position in positions:
+                if position in self._cache:
+                    self._cache.move_to_end(position)
+                    found[position] = self._cache[position]
+
+        missing = [position for position in positions if position not in found]
+        if missing:
+            # Same SQL text for the same count, so sqlite3's statement cache reuses the prepared statement
+            placeholders = ",".join("?" * len(missing))
+            with self.connection() as connection:
+                rows = connection.execute(
+                    f"SELECT position, id, content, category, metadata FROM entries WHERE position IN ({placeholders})",
+                    missing
+                ).fetchall()
+            with self._lock:
+                for row in rows:
+                    entry = self._to_entry(row)
+                    found[row[0]] = entry
+                    self._cache[row[0]] = entry
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return [found[position] for position in positions if position in found]
+
+    @staticmethod
+    def _to_entry(row) -> Dict[str, Any]:
+        _, entry_id, content, category, metadata = row
+        return {
+            'id': entry_id,
+            'content': content,
+            'category': category,
+            'metadata': json.loads(metadata) if metadata else {}
+        }
+
+class SQLitePositions:
+    """Mapping from entry id to matrix row, looked up in SQLite on demand"""
+
+    def __init__(self, entries: SQLiteEntries):
+        self.entries = entries
+
+    def get(self, entry_id, default=None) -> Optional[int]:
+        with self.entries.connection() as connection:
+            row = connection.execute("SELECT position FROM entries WHERE id = ?", (entry_id,)).fetchone()
+        return row[0] if row else default
+
+    def __getitem__(self, entry_id) -> int:
+        position = self.get(entry_id)
+        if position is None:
+            raise KeyError(entry_id)
+        return position
+
+    def __contains__(self, entry_id) -> bool:
+        return self.get(entry_id) is not None
+
+def open_sqlite_store(store_path: str):
+    """Return (database dict with lazy 'knowledge_base', memory-mapped embedding matrix)"""
+    connection = sqlite3.connect(f"file:{os.path.abspath(store_path)}?immutable=1", uri=True)
+    try:
+        info = {key: json.loads(value) for key, value in connection.execute("SELECT key, value FROM info")}
+    finally:
+        connection.close()
+
+    # Both files are opened now, so this index keeps its generation after the pointer moves on
+    store_dir = os.path.dirname(os.path.abspath(store_path))
+    entries = SQLiteEntries(os.path.join(store_dir, info.pop('entries_file')))
+    matrix = np.load(os.path.join(store_dir, info.pop('embeddings_file')), mmap_mode='r')
+
+    database = dict(info)
+    database['knowledge_base'] = entries
+    return database, matrix
+
+def _remove_stale_files(out_dir: str, prefix: str, suffix: str, keep: str, keep_previous: int = 1):
+    """Delete old generation files, keeping the newest few for indexes not yet loaded"""
+    stale = [
+        os.path.join(out_dir, name) for name in os.listdir(out_dir)
+        if name.startswith(prefix) and name.endswith(suffix) and name != keep
+    ]
+    stale.sort(key=os.path.getmtime, reverse=True)
+    for path in stale[keep_previous:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def main():
+    if len(sys.argv) != 3:
+        print("Usage: python knowledge_store.py <database.json> <store.sqlite>")
+        sys.exit(1)
+
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        database = json.load(f)
+    write_sqlite_store(database, sys.argv[2])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+# Paths that can serve a response, reported as `served_by`
+SERVED_LLM = "llm"
+SERVED_LLM_HEDGED = "llm_hedged"
+SERVED_LLM_CACHED = "llm_cached"
+SERVED_LLM_ERROR = "llm_error"  # Gemini failed or returned nothing (no SLO mode)
+SERVED_FALLBACK_TIMEOUT = "fallback_timeout"
+SERVED_FALLBACK_ERROR = "fallback_error"
+
+# Paths whose response is a real LLM answer, safe to reuse for other requests
+LLM_ANSWERS = (SERVED_LLM, SERVED_LLM_HEDGED, SERVED_LLM_CACHED)
+
+class SLOGenerator:
+    def __init__(self,
+                 llm_fn: Callable[[str], Optional[str]],
+                 fallback_fn: Callable[[str, List[Dict[Any, Any]]], str],
+                 deadline: float,
+                 hedge_after: Optional[float] = None,
+                 max_workers: int = 8,
+                 cache_size: int = 256):
+        """Serve LLM answers within a latency deadline, degrading to rule-based formatting
+
+        llm_fn takes a prompt and returns text (or raises); fallback_fn takes the
+        query and retrieved context. If the LLM has not answered within `deadline`
+        seconds the fallback answer is returned and the late LLM answer is cached
+        for the next identical request (same prompt, so conversation history counts). With `hedge_after` set, a duplicate LLM
+        request is issued once the first one has been outstanding that long and
+        whichever finishes first wins.
+        """
+        self.llm_fn = llm_fn
+        self.fallback_fn = fallback_fn
+        self.deadline = deadline
+        self.hedge_after = hedge_after if hedge_after is not None and hedge_after < deadline else None
+        self.cache_size = cache_size
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._served_counts = {}
+
+    def generate(self, query: str, context_entries: List[Dict[Any, Any]], prompt: str,
+                 version=None) -> Tuple[str, str]:
+        """Return (response, served_by) for a query within the latency deadline"""
+
+        # The prompt carries the session's history, so follow-ups never share answers across sessions
+        key = (version, tuple(entry['entry']['id'] for entry in context_entries),
+               hashlib.sha1(prompt.encode('utf-8')).hexdigest())
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+        if cached is not None:
+            return self._served(cached, SERVED_LLM_CACHED)
+
+        start = time.monotonic()
+        primary = self._executor.submit(self.llm_fn, prompt)
+        pending = {primary}
+        hedged = False
+
+        while pending:
+            now = time.monotonic() - start
+            remaining = self.deadline - now
+            if remaining <= 0:
+                break
+
+            # Wake up in time to send the hedge request if it is still due
+            timeout = remaining
+            if self.hedge_after is not None and not hedged:
+                timeout = min(timeout, max(self.hedge_after - now, 0))
+
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = self._result_or_none(future)
+                if result:
+                    self._store(key, result)
+                    self._abandon(pending, key)
+                    return self._served(result, SERVED_LLM if future is primary else SERVED_LLM_HEDGED)
+
+            # Hedge when the primary is slow, or retry once if it already failed
+            due = self.hedge_after is not None and time.monotonic() - start >= self.hedge_after
+            if not hedged and (due or not pending):
+                pending.add(self._executor.submit(self.llm_fn, prompt))
+                hedged = True
+
+        self._abandon(pending, key)
+        reason = SERVED_FALLBACK_TIMEOUT if pending else SERVED_FALLBACK_ERROR
+        return self._served(self.fallback_fn(query, context_entries), reason)
+
+    def clear_cache(self):
+        """Drop cached LLM answers (e.g. after the knowledge base is reloaded)"""
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many requests each path has served"""
+        with self._lock:
+            return {
+                "served_by": dict(self._served_counts),
+                "cached_answers": len(self._cache)
+            }
+
+    def _served(self, response: str, served_by: str) -> Tuple[str, str]:
+        with self._lock:
+            self._served_counts[served_by] = self._served_counts.get(served_by, 0) + 1
+        return response, served_by
+
+    def _store(self, key, response: str):
+        with self._lock:
+            self._cache[key] = response
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _abandon(self, pending, key):
+        """Drop queued LLM calls; let running ones finish in the background and cache their answer"""
+        for future in pending:
+            # A call still waiting for a worker would only delay newer requests behind it
+            if not future.cancel():
+                future.add_done_callback(lambda f: self._store_late(f, key))
+
+    def _store_late(self, future, key):
+        result = self._result_or_none(future)
+        if result:
+            self._store(key, result)
+
+    @staticmethod
+    def _result_or_none(future) -> Optional[str]:
+        try:
+            return future.result()
+        except Exception:
+            return None
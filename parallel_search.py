@@ -0,0 +1,97 @@
+"""
+Multi-threaded exact top-k search over large embedding matrices
+
+The matrix is split into row blocks that are scored on a thread pool (NumPy's
+matrix-vector product releases the GIL), or on the calling thread with one thread.
+Each task keeps a running top-k min-heap over its blocks, scoring into a reused
+buffer, and the per-task heaps are merged at the end, so no score array the size of
+the matrix is ever allocated. Equal scores go to the lower row, as in
+retrieval.top_candidates.
+"""
+
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from retrieval import normalize_query, top_positions
+
+class BlockedSearcher:
+    def __init__(self, threads: Optional[int] = None, block_rows: int = 4096, min_parallel_rows: int = 65536):
+        """Exact cosine search with `threads` workers (default: CPU count) over blocks of block_rows
+
+        With one thread, and for matrices smaller than min_parallel_rows (where the
+        pool's hand-off costs more than it saves), the blocks are scanned on the
+        calling thread.
+        """
+        self.threads = threads or os.cpu_count() or 1
+        self.block_rows = block_rows
+        self.min_parallel_rows = min_parallel_rows
+        self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="search") \
+            if self.threads > 1 else None
+
+    def top_candidates(self, matrix: np.ndarray, query_embedding, n: int):
+        """Return (indices, cosine scores) of the n best rows, best first"""
+        rows = matrix.shape[0]
+        if rows == 0 or n <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = normalize_query(query_embedding).astype(matrix.dtype, copy=False)
+        n = min(n, rows)
+
+        if self._executor is None or rows < self.min_parallel_rows:
+            heaps = [self._search_range(matrix, query, n, 0, rows)]
+        else:
+            # One contiguous range of whole blocks per task
+            blocks = -(-rows // self.block_rows)
+            per_task = -(-blocks // self.threads)
+            ranges = [
+                (start * self.block_rows, min((start + per_task) * self.block_rows, rows))
+                for start in range(0, blocks, per_task)
+            ]
+            heaps = self._executor.map(lambda bounds: self._search_range(matrix, query, n, *bounds), ranges)
+
+        # Heap items are (score, -index), so equal scores resolve to the lower row
+        best = heapq.nlargest(n, (item for heap in heaps for item in heap))
+        return (np.asarray([-negative_index for _, negative_index in best], dtype=np.int64),
+                np.asarray([score for score, _ in best], dtype=np.float32))
+
+    def _search_range(self, matrix: np.ndarray, query: np.ndarray, n: int, start: int, stop: int):
+        """Running top-n min-heap over rows [start, stop)"""
+        heap = []
+        buffer = np.empty(min(self.block_rows, stop - start), dtype=np.result_type(matrix.dtype, query.dtype))
+        for block_start in range(start, stop, self.block_rows):
+            block = matrix[block_start:min(block_start + self.block_rows, stop)]
+            scores = buffer[:block.shape[0]]
+            np.dot(block, query, out=scores)
+
+            # Only rows that beat the current heap minimum can enter it
+            if len(heap) == n:
+                candidates = np.flatnonzero(scores >= heap[0][0])
+            else:
+                candidates = np.arange(scores.shape[0])
+            if candidates.shape[0] > n:
+                candidates = candidates[top_positions(scores[candidates], n)]
+
+            # A tie replaces the heap minimum only if it is the lower row
+            for i in candidates:
+                item = (float(scores[i]), -(block_start + int(i)))
+                if len(heap) < n:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+        return heap
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+def make_searcher(threads: int, block_rows: int = 4096) -> Optional[BlockedSearcher]:
+    """Build a searcher for SEARCH_THREADS-style config; 0 keeps the plain NumPy scan
+
+    1 runs the blocked kernel on the request thread (bounded memory, no pool).
+    """
+    if threads <= 0:
+        return None
+    return BlockedSearcher(threads, block_rows)
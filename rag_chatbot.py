@@ -1,103 +1,207 @@
-import json
-import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from contextlib import nullcontext
 import google.generativeai as genai
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from retrieval import KnowledgeIndex
+from reranker import Reranker
+from latency_slo import SLOGenerator, SERVED_LLM, SERVED_LLM_ERROR, LLM_ANSWERS
+from semantic_cache import SemanticCache
+from session_store import resolve_followup
+from answer_table import AnswerTable
+from admission import AdmissionController
+from chatbot_base import KnowledgeBaseChatbot
+from simple_rag_chatbot import format_simple_response
 
-class RAGChatbot:
-    def __init__(self, db_path: str, gemini_api_key: str):
-        """Initialize RAG Chatbot"""
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+class RAGChatbot(KnowledgeBaseChatbot):
+    def __init__(self, db_path: str, gemini_api_key: str,
+                 llm_deadline: Optional[float] = None, hedge_after: Optional[float] = None,
+                 reranker: Optional[Reranker] = None, candidate_pool: int = 20,
+                 semantic_cache: Optional[SemanticCache] = None,
+                 encoder=None, index_loader: Optional[Callable[[str], KnowledgeIndex]] = None,
+                 session_store=None, answer_table: Optional[AnswerTable] = None,
+                 searcher=None, admission: Optional[AdmissionController] = None,
+                 encoder_tolerance: Optional[float] = None):
+        """Initialize RAG Chatbot
+
+        With llm_deadline (seconds) set, Gemini calls that miss the deadline are
+        answered with the rule-based SimpleRAGChatbot formatting instead.
+        With a reranker, the top candidate_pool cosine matches are re-ranked
+        before the top_k context entries are chosen.
+        With a semantic_cache, answers are reused for near-duplicate questions.
+        encoder replaces the one selected by ENCODER (see encoders.py), e.g. with a
+        RemoteEncoder, and index_loader replaces JSON loading (e.g. attach_shared_index).
+        With encoder_tolerance, a database whose stored vectors the encoder does not
+        reproduce (cosine below 1 - tolerance) is refused.
+        With a session_store, chat(session_id=...) resolves follow-up questions
+        against the conversation so far.
+        With an answer_table, frequent questions are answered from precomputed
+        answers for the current database version.
+        A searcher (parallel_search.BlockedSearcher) spreads the cosine scan over threads.
+        With admission, encoding, retrieval and generation each run under that
+        stage's concurrency cap (and raise admission.Overloaded when it is full).
+        """
         self.gemini_api_key = gemini_api_key
+        self.semantic_cache = semantic_cache
+        self.admission = admission
         
         # Configure Gemini API
         genai.configure(api_key=gemini_api_key)
         
-        # Load database
-        self.load_database(db_path)
-        
-    def load_database(self, db_path: str):
-        """Load the RAG database"""
-        with open(db_path, 'r', encoding='utf-8') as f:
-            self.database = json.load(f)
-        
-        # Convert embeddings back to numpy arrays
-        for entry in self.database['knowledge_base']:
-            entry['embedding'] = np.array(entry['embedding'])
-            
-        print(f"Loaded database with {len(self.database['knowledge_base'])} entries")
+        # Latency-SLO mode: hedge slow LLM calls and fall back to rule-based answers
+        self.slo_generator = None
+        if llm_deadline is not None:
+            self.slo_generator = SLOGenerator(self.call_llm, format_simple_response,
+                                              deadline=llm_deadline, hedge_after=hedge_after)
+        
+        # Load database (after the caches above exist: loading clears them)
+        super().__init__(db_path, reranker=reranker, candidate_pool=candidate_pool, encoder=encoder,
+                         index_loader=index_loader, session_store=session_store, answer_table=answer_table,
+                         searcher=searcher, encoder_tolerance=encoder_tolerance)
+        
+    def _clear_caches(self, index: KnowledgeIndex):
+        super()._clear_caches(index)
+        if self.semantic_cache is not None:
+            self.semantic_cache.invalidate(index.version)
+        if self.slo_generator is not None:
+            self.slo_generator.clear_cache()
     
-    def find_similar_context(self, query: str, top_k: int = 3, similarity_threshold: float = 0.3) -> List[Dict[Any, Any]]:
-        """Find similar context from the database"""
-        
-        # Generate embedding for the query
-        query_embedding = self.model.encode([query])
-        
-        # Calculate similarities
-        similarities = []
-        for entry in self.database['knowledge_base']:
-            similarity = cosine_similarity(query_embedding, [entry['embedding']])[0][0]
-            if similarity >= similarity_threshold:
-                similarities.append({
-                    'entry': entry,
-                    'similarity': similarity
-                })
-        
-        # Sort by similarity and return top_k
-        similarities.sort(key=lambda x: x['similarity'], reverse=True)
-        return similarities[:top_k]
-    
-    def generate_response(self, query: str, context_entries: List[Dict[Any, Any]]) -> str:
-        """Generate response using Gemini API with context"""
+    def build_prompt(self, query: str, context_entries: List[Dict[Any, Any]],
+                     history: Optional[List[Tuple[str, str]]] = None) -> str:
+        """Build the Gemini prompt from the query, retrieved context and recent conversation"""
         
         # Prepare context
         context_text = "\n\n".join([entry['entry']['content'] for entry in context_entries])
         
+        # Earlier turns let the model resolve follow-ups like "and their email?"
+        history_text = ""
+        if history:
+            history_text = "Previous Conversation:\n" + "\n".join(
+                f"User: {past_query}\nAssistant: {past_response[:300]}" for past_query, past_response in history
+            ) + "\n\n"
+        
         # Create prompt
-        prompt = f"""You are a helpful assistant for MachDatum company. Use the following context information to answer the user's question. If the context doesn't contain relevant information, politely say so and provide general guidance.
+        return f"""You are a helpful assistant for MachDatum company. Use the following context information to answer the user's question. If the context doesn't contain relevant information, politely say so and provide general guidance.
 
 Context Information:
 {context_text}
 
-User Question: {query}
+{history_text}User Question: {query}
 
 Please provide a helpful, accurate, and professional response based on the context. If you're referencing specific information from the context, make sure it's accurate."""
 
+    def call_llm(self, prompt: str) -> Optional[str]:
+        """Send a prompt to Gemini and return the raw text (raises on API errors)"""
+        # Generate response with Gemini using the older API
+        response = genai.generate_text(
+            model='models/text-bison-001',
+            prompt=prompt,
+            temperature=0.7,
+            max_output_tokens=800
+        )
+        return response.result
+    
+    def generate_response(self, query: str, context_entries: List[Dict[Any, Any]],
+                          history: Optional[List[Tuple[str, str]]] = None) -> Tuple[str, str]:
+        """Generate response using Gemini API with context; returns (response, served_by)
+
+        served_by is SERVED_LLM for a real answer and SERVED_LLM_ERROR when Gemini
+        failed or returned nothing and the response is an apology.
+        """
+        
+        prompt = self.build_prompt(query, context_entries, history)
+
         try:
-            # Generate response with Gemini using the older API
-            response = genai.generate_text(
-                model='models/text-bison-001',
-                prompt=prompt,
-                temperature=0.7,
-                max_output_tokens=800
-            )
-            return response.result if response.result else "I apologize, but I couldn't generate a proper response. Please try rephrasing your question."
+            result = self.call_llm(prompt)
+            if result:
+                return result, SERVED_LLM
+            return "I apologize, but I couldn't generate a proper response. Please try rephrasing your question.", SERVED_LLM_ERROR
         except Exception as e:
-            return f"I apologize, but I encountered an error while generating a response: {str(e)}. Please try rephrasing your question."
+            return f"I apologize, but I encountered an error while generating a response: {str(e)}. Please try rephrasing your question.", SERVED_LLM_ERROR
     
-    def chat(self, user_input: str) -> Dict[str, Any]:
-        """Main chat function"""
+    def chat(self, user_input: str, session_id: Optional[str] = None, use_precomputed: bool = True) -> Dict[str, Any]:
+        """Main chat function
+
+        use_precomputed=False always answers live, skipping both the answer table and
+        the semantic cache (as the answer table build needs).
+        """
+        
+        index, session, answer_table, result = self._begin_turn(user_input, session_id, use_precomputed)
+        if result is not None:
+            return result
+        
+        # Encode once for the answer table, the semantic cache, the session and retrieval
+        with self._stage('encode'):
+            query_embedding = self.model.encode([user_input])[0]
+        
+        # Follow-ups are searched with the conversation vector blended in, or reuse the last context
+        retrieval_embedding, reused_contexts, followup = resolve_followup(session, index, user_input, query_embedding)
+        
+        # Near-exact rewordings of a precomputed question
+        if not followup:
+            result = self._precomputed_rewording(answer_table, index, session_id, session, user_input, query_embedding)
+            if result is not None:
+                return result
+        
+        # Serve near-duplicate questions from the semantic cache (not follow-ups: they depend on the session)
+        cached = None
+        if self.semantic_cache is not None and use_precomputed and not followup:
+            cached = self.semantic_cache.lookup(query_embedding, index.version)
+            if cached is not None and not cached['verify']:
+                return self._record_turn(session_id, session, user_input, query_embedding, cached['context_ids'],
+                                         dict(cached['result'], served_by="semantic_cache"))
         
         # Find similar context
-        similar_contexts = self.find_similar_context(user_input, top_k=3)
+        if reused_contexts is not None:
+            similar_contexts = reused_contexts
+        else:
+            with self._stage('retrieve'):
+                similar_contexts = self.find_similar_context(user_input, top_k=3, query_embedding=retrieval_embedding,
+                                                             index=index)
+        context_ids = [entry['entry']['id'] for entry in similar_contexts]
+        
+        # Sampled hits are checked against fresh retrieval; a different context is a false hit
+        if cached is not None:
+            false_hit = set(cached['context_ids']) != set(context_ids)
+            self.semantic_cache.record_verification(false_hit)
+            if not false_hit:
+                return self._record_turn(session_id, session, user_input, query_embedding, context_ids,
+                                         dict(cached['result'], served_by="semantic_cache"))
         
         if not similar_contexts:
-            return {
+            return self._record_turn(session_id, session, user_input, query_embedding, [], {
                 "response": "I don't have specific information about that topic in my knowledge base. Could you please rephrase your question or ask about MachDatum's services, company information, or contact details?",
                 "context_used": [],
-                "similarity_scores": []
-            }
+                "similarity_scores": [],
+                "served_by": "no_context"
+            })
         
         # Generate response
-        response = self.generate_response(user_input, similar_contexts)
-        
-        return {
+        history = session.history() if followup else None
+        with self._stage('generate'):
+            if self.slo_generator is not None:
+                prompt = self.build_prompt(user_input, similar_contexts, history)
+                response, served_by = self.slo_generator.generate(user_input, similar_contexts, prompt,
+                                                                     version=index.version)
+            else:
+                response, served_by = self.generate_response(user_input, similar_contexts, history)
+        
+        result = {
             "response": response,
             "context_used": [entry['entry']['content'][:200] + "..." for entry in similar_contexts],
-            "similarity_scores": [entry['similarity'] for entry in similar_contexts]
+            "similarity_scores": [entry['similarity'] for entry in similar_contexts],
+            "served_by": served_by,
+            "context_reused": reused_contexts is not None
         }
+        
+        # Only standalone LLM answers are cached; fallbacks, llm_error apologies and follow-ups are not reused
+        if self.semantic_cache is not None and not followup and served_by in LLM_ANSWERS:
+            self.semantic_cache.store(query_embedding, index.version, result, context_ids)
+        
+        return self._record_turn(session_id, session, user_input, query_embedding, context_ids, result)
+    
+    def _stage(self, name: str):
+        """Hold a slot of an admission stage for the duration of a with block"""
+        return self.admission.stage(name) if self.admission is not None else nullcontext()
 
 def main():
     """Test the chatbot"""
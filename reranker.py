@@ -0,0 +1,183 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'of', 'to', 'in', 'on', 'for', 'with', 'is', 'are', 'was',
+    'do', 'does', 'did', 'what', 'how', 'who', 'can', 'i', 'you', 'your', 'we', 'our', 'me',
+    'about', 'tell', 'it', 'its', 'be', 'by', 'at', 'as', 'this', 'that'
+}
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+class LexicalOverlapScorer:
+    """Scores candidates by the fraction of query terms that appear in the entry"""
+
+    name = "lexical"
+
+    def score(self, query: str, candidates: List[Dict[Any, Any]]) -> List[float]:
+        query_terms = set(tokenize(query))
+        if not query_terms:
+            return [candidate['similarity'] for candidate in candidates]
+
+        scores = []
+        for candidate in candidates:
+            entry_terms = set(tokenize(candidate['entry']['content']))
+            scores.append(len(query_terms & entry_terms) / len(query_terms))
+        return scores
+
+class LinearFeatureScorer:
+    """Lightweight learned scorer: a linear blend of bi-encoder and lexical features
+
+    Features are [cosine similarity, lexical overlap, query/category match, 1].
+    Weights can be fitted from labelled (query, candidate, relevance) examples.
+    """
+
+    name = "linear"
+    CATEGORY_KEYWORDS = {
+        'services': ['service', 'services', 'offer', 'provide', 'solution'],
+        'contact': ['contact', 'reach', 'email', 'phone', 'address'],
+        'team': ['team', 'people', 'staff', 'who', 'member'],
+        'company_info': ['about', 'company', 'background', 'history'],
+        'technology': ['technology', 'tech', 'tools', 'platform']
+    }
+
+    def __init__(self, weights: Optional[List[float]] = None):
+        self.weights = np.asarray(weights if weights is not None else [0.6, 0.3, 0.1, 0.0], dtype=np.float32)
+        self._lexical = LexicalOverlapScorer()
+
+    def features(self, query: str, candidates: List[Dict[Any, Any]]) -> np.ndarray:
+        query_lower = query.lower()
+        lexical = self._lexical.score(query, candidates)
+        rows = []
+        for candidate, overlap in zip(candidates, lexical):
+            keywords = self.CATEGORY_KEYWORDS.get(candidate['entry'].get('category'), [])
+            category_match = 1.0 if any(word in query_lower for word in keywords) else 0.0
+            rows.append([candidate['similarity'], overlap, category_match, 1.0])
+        return np.asarray(rows, dtype=np.float32)
+
+    def score(self, query: str, candidates: List[Dict[Any, Any]]) -> List[float]:
+        return (self.features(query, candidates) @ self.weights).tolist()
+
+    def fit(self, examples: List[tuple]):
+        """Least-squares fit from (query, candidate, relevance) examples"""
+        features = np.vstack([self.features(query, [candidate]) for query, candidate, _ in examples])
+        labels = np.asarray([relevance for _, _, relevance in examples], dtype=np.float32)
+        self.weights = np.linalg.lstsq(features, labels, rcond=None)[0].astype(np.float32)
+        return self
+
+class CrossEncoderScorer:
+    """Scores (query, entry) pairs jointly with a sentence-transformers cross-encoder"""
+
+    name = "cross-encoder"
+
+    def __init__(self, model_name: str = 'cross-encoder/ms-marco-MiniLM-L-6-v2'):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name)
+
+    def score(self, query: str, candidates: List[Dict[Any, Any]]) -> List[float]:
+        pairs = [(query, candidate['entry']['content']) for candidate in candidates]
+        return [float(score) for score in self.model.predict(pairs)]
+
+SCORERS = {
+    'lexical': LexicalOverlapScorer,
+    'linear': LinearFeatureScorer,
+    'cross-encoder': CrossEncoderScorer
+}
+
+class Reranker:
+    def __init__(self, scorer, budget_ms: float = 50.0, batch_size: int = 16, cache_size: int = 4096):
+        """Re-rank retrieval candidates with a pluggable scorer under a per-query time budget
+
+        Candidates are scored in batches, best bi-encoder candidates first. The very
+        first call scores a single candidate to measure the scorer's cost; after that,
+        each batch is cut to what the remaining budget allows at that cost. Candidates
+        left unscored keep their bi-encoder order behind the re-ranked ones.
+        Scores are cached per (database version, query, entry id).
+        """
+        self.scorer = scorer
+        self.budget = budget_ms / 1000.0
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._seconds_per_item = None  # Running estimate of scorer cost
+
+    def rerank(self, query: str, candidates: List[Dict[Any, Any]], top_k: int, version=None) -> List[Dict[Any, Any]]:
+        start = time.perf_counter()
+        scores = {}
+        uncached = []
+
+        with self._lock:
+            for position, candidate in enumerate(candidates):
+                key = (version, query, candidate['entry']['id'])
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[position] = self._cache[key]
+                else:
+                    uncached.append(position)
+
+        offset = 0
+        while offset < len(uncached):
+            batch = uncached[offset:offset + self.batch_size]
+            remaining = self.budget - (time.perf_counter() - start)
+            if remaining <= 0:
+                break
+            if self._seconds_per_item is None:
+                # No cost estimate yet: score one candidate to measure the scorer before a full batch
+                batch = batch[:1]
+            elif remaining < self._seconds_per_item * len(batch):
+                batch = batch[:int(remaining / self._seconds_per_item)]
+            if not batch:
+                break
+
+            batch_start = time.perf_counter()
+            batch_scores = self.scorer.score(query, [candidates[position] for position in batch])
+            self._observe(time.perf_counter() - batch_start, len(batch))
+            offset += len(batch)
+
+            with self._lock:
+                for position, score in zip(batch, batch_scores):
+                    scores[position] = score
+                    self._cache[(version, query, candidates[position]['entry']['id'])] = score
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        # Equal scores keep bi-encoder order, however much of the list came from the cache
+        scored = sorted(scores, key=lambda position: (-scores[position], position))
+        unscored = [position for position in range(len(candidates)) if position not in scores]
+
+        results = []
+        for position in (scored + unscored)[:top_k]:
+            candidate = dict(candidates[position])
+            if position in scores:
+                candidate['rerank_score'] = float(scores[position])
+            results.append(candidate)
+        return results
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _observe(self, elapsed: float, count: int):
+        per_item = elapsed / max(count, 1)
+        if self._seconds_per_item is None:
+            self._seconds_per_item = per_item
+        else:
+            self._seconds_per_item = 0.8 * self._seconds_per_item + 0.2 * per_item
+
+def make_reranker(scorer_name: Optional[str], budget_ms: float = 50.0) -> Optional[Reranker]:
+    """Build a Reranker from a scorer name ('lexical', 'linear', 'cross-encoder'), or None"""
+    if not scorer_name:
+        return None
+    if scorer_name not in SCORERS:
+        raise ValueError(f"Unknown re-rank scorer '{scorer_name}'. Choose from: {', '.join(SCORERS)}")
+    return Reranker(SCORERS[scorer_name](), budget_ms=budget_ms)
@@ -0,0 +1,116 @@
+import json
+import os
+
+import numpy as np
+from typing import List, Dict, Any, Optional
+
+def database_version(db_path: str) -> str:
+    """Identify a database file revision by size and modification time"""
+    stat = os.stat(db_path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+def build_embedding_matrix(entries: List[Dict[Any, Any]]) -> np.ndarray:
+    """Stack entry embeddings into an L2-normalized float32 matrix (one row per entry)"""
+    if not entries:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    matrix = np.asarray([entry['embedding'] for entry in entries], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0  # Placeholder (all-zero) embeddings stay zero
+    return matrix / norms
+
+def normalize_query(query_embedding) -> np.ndarray:
+    """Flatten and L2-normalize a query embedding"""
+    query_vec = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(query_vec)
+    return query_vec / norm if norm > 0 else query_vec
+
+def top_candidates(matrix: np.ndarray, query_embedding, n: int):
+    """Return (indices, cosine scores) of the n best rows, best first"""
+    if matrix.shape[0] == 0 or n <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    scores = matrix @ normalize_query(query_embedding)
+    indices = top_positions(scores, n)
+    return indices, scores[indices]
+
+def top_positions(scores: np.ndarray, n: int) -> np.ndarray:
+    """Positions of the n highest scores, best first; equal scores go to the lower position"""
+    n = min(n, scores.shape[0])
+    if n < scores.shape[0]:
+        # Keep every score tied with the n-th best, so the cut between ties is made by position
+        kth = np.partition(scores, scores.shape[0] - n)[scores.shape[0] - n]
+        indices = np.flatnonzero(scores >= kth)
+    else:
+        indices = np.arange(scores.shape[0])
+    return indices[np.argsort(-scores[indices], kind='stable')][:n]
+
+class KnowledgeIndex:
+    def __init__(self, database: Dict[str, Any], version: Optional[str] = None, db_path: Optional[str] = None,
+                 embedding_matrix: Optional[np.ndarray] = None):
+        """Read-only snapshot of a loaded database: entries, embedding matrix and version
+
+        Chatbots hold one reference and swap it for a new snapshot on reload, so a
+        request that picked up the old snapshot finishes on it unchanged. A prebuilt
+        (already normalized) embedding_matrix, e.g. a memory-mapped one, is used as is.
+        """
+        self.database = database
+        self.entries = database['knowledge_base']
+        if embedding_matrix is None:
+            embedding_matrix = build_embedding_matrix(self.entries)
+        self.embedding_matrix = embedding_matrix
+        if hasattr(self.entries, 'fetch'):
+            from knowledge_store import SQLitePositions
+            self.positions = SQLitePositions(self.entries)
+        else:
+            self.positions = {entry['id']: position for position, entry in enumerate(self.entries)}
+        self.version = version
+        self.db_path = db_path
+
+    @classmethod
+    def load(cls, db_path: str) -> 'KnowledgeIndex':
+        """Open a database file as a new snapshot: a JSON file is parsed, a SQLite store opened lazily"""
+        # Stat before reading: a rewrite during the read shows up as a newer version later
+        version = database_version(db_path)
+
+        if db_path.endswith(('.sqlite', '.db')):
+            from knowledge_store import open_sqlite_store
+            database, matrix = open_sqlite_store(db_path)
+            return cls(database, version, db_path, embedding_matrix=matrix)
+
+        with open(db_path, 'r', encoding='utf-8') as f:
+            database = json.load(f)
+
+        # Convert embeddings back to numpy arrays
+        for entry in database['knowledge_base']:
+            entry['embedding'] = np.array(entry['embedding'])
+        return cls(database, version, db_path)
+
+def fetch_entries(entries, positions) -> List[Dict[Any, Any]]:
+    """Entries at the given positions; lazy stores fetch them in a single query"""
+    if hasattr(entries, 'fetch'):
+        return entries.fetch(positions)
+    return [entries[i] for i in positions]
+
+def find_similar(matrix: np.ndarray, entries: List[Dict[Any, Any]], query_embedding, query: str,
+                 top_k: int = 3, similarity_threshold: float = 0.3,
+                 reranker=None, candidate_pool: Optional[int] = None, version=None,
+                 searcher=None) -> List[Dict[Any, Any]]:
+    """Two-stage retrieval: cosine top-N from the matrix, optional re-rank, truncate to top_k
+
+    A searcher (parallel_search.BlockedSearcher) replaces the single-threaded top-N scan.
+    """
+
+    pool = max(top_k, candidate_pool or top_k) if reranker is not None else top_k
+    search = searcher.top_candidates if searcher is not None else top_candidates
+    indices, scores = search(matrix, query_embedding, pool)
+
+    keep = [(i, float(score)) for i, score in zip(indices, scores) if score >= similarity_threshold]
+    candidates = [
+        {'entry': entry, 'similarity': score}
+        for entry, (_, score) in zip(fetch_entries(entries, [i for i, _ in keep]), keep)
+    ]
+
+    if reranker is not None and len(candidates) > 1:
+        return reranker.rerank(query, candidates, top_k, version=version)
+    return candidates[:top_k]
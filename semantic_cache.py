@@ -0,0 +1,114 @@
+import random
+import threading
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from retrieval import normalize_query
+
+class SemanticCache:
+    def __init__(self, capacity: int = 512, similarity_threshold: float = 0.92, verify_rate: float = 0.05):
+        """Reuse final chat results for near-duplicate questions
+
+        Query embeddings live in a (capacity x dim) matrix, allocated on first use,
+        so a lookup is one matrix-vector product. A lookup hits when the best cached
+        query has cosine similarity >= similarity_threshold and was cached for the
+        knowledge-base version set by the last invalidate(). The least recently used
+        slot is evicted when full.
+
+        A fraction (verify_rate) of hits is re-checked by the caller against fresh
+        retrieval and the outcome reported with record_verification.
+        """
+        self.capacity = capacity
+        self.similarity_threshold = similarity_threshold
+        self.verify_rate = verify_rate
+
+        self._embeddings = None
+        self._slots: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._clock = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.hits = 0
+        self.verified_hits = 0
+        self.false_hits = 0
+
+    def lookup(self, query_embedding, version) -> Optional[Dict[str, Any]]:
+        """Return {'result', 'context_ids', 'similarity', 'verify'} for a near-duplicate query, or None"""
+        query_vec = normalize_query(query_embedding)
+        with self._lock:
+            self.lookups += 1
+            if version != self._version or self._embeddings is None:
+                return None
+
+            scores = self._embeddings @ query_vec
+            slot = int(np.argmax(scores))
+            if self._slots[slot] is None or scores[slot] < self.similarity_threshold:
+                return None
+
+            self.hits += 1
+            self._clock += 1
+            self._last_used[slot] = self._clock
+            cached = self._slots[slot]
+            return {
+                'result': cached['result'],
+                'context_ids': cached['context_ids'],
+                'similarity': float(scores[slot]),
+                'verify': random.random() < self.verify_rate
+            }
+
+    def store(self, query_embedding, version, result: Dict[str, Any], context_ids: List[Any]):
+        """Cache a final chat result for this query embedding"""
+        query_vec = normalize_query(query_embedding)
+        with self._lock:
+            # Answers computed against an older database version are dropped
+            if version != self._version:
+                return
+            if self._embeddings is None:
+                self._embeddings = np.zeros((self.capacity, query_vec.shape[0]), dtype=np.float32)
+
+            # Replace an existing near-identical query, else an empty slot, else the LRU one
+            scores = self._embeddings @ query_vec
+            slot = int(np.argmax(scores))
+            if self._slots[slot] is None or scores[slot] < self.similarity_threshold:
+                empty = [index for index, cached in enumerate(self._slots) if cached is None]
+                slot = empty[0] if empty else int(np.argmin(self._last_used))
+
+            self._clock += 1
+            self._embeddings[slot] = query_vec
+            self._slots[slot] = {'result': result, 'context_ids': list(context_ids)}
+            self._last_used[slot] = self._clock
+
+    def record_verification(self, false_hit: bool):
+        """Record the outcome of re-checking a sampled hit against fresh retrieval"""
+        with self._lock:
+            self.verified_hits += 1
+            if false_hit:
+                self.false_hits += 1
+
+    def invalidate(self, version=None):
+        """Drop every cached answer (e.g. after the knowledge base is rebuilt)"""
+        with self._lock:
+            self._reset(version)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': sum(cached is not None for cached in self._slots),
+                'capacity': self.capacity,
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+                'verified_hits': self.verified_hits,
+                'false_hits': self.false_hits,
+                'false_hit_rate': self.false_hits / self.verified_hits if self.verified_hits else 0.0
+            }
+
+    def _reset(self, version):
+        if self._embeddings is not None:
+            self._embeddings[:] = 0
+        self._slots = [None] * self.capacity
+        self._last_used[:] = 0
+        self._version = version
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Multi-process serving with a shared, memory-mapped embedding matrix
+
+The parent process exports the database once (see shared_index.py), optionally starts
+a central encoder process, binds the listening socket and forks N Flask workers that
+all accept on it. Workers map the matrix read-only instead of each parsing the JSON
+database, and with --central-encoder they never load the encoder model.
+
+Usage:
+    python serve_shared.py --workers 4 [--central-encoder] [--app simple_web_app]
+
+Linux/macOS only (workers are forked and inherit the listening socket).
+"""
+
+import argparse
+import importlib
+import multiprocessing
+import os
+import secrets
+import socket
+import time
+
+from hot_reload import DatabaseWatcher
+from shared_index import export_shared_index, attach_shared_index
+
+DB_PATH = os.getenv('KNOWLEDGE_DB', "machdatum_rag_db.json")
+SHARED_DIR = ".shared_index"
+
+def serving_options_from_env():
+    """Chatbot keyword arguments for a worker started by this launcher (empty otherwise)"""
+    options = {}
+    if os.getenv('SHARED_INDEX_MANIFEST'):
+        options['index_loader'] = attach_shared_index
+    if os.getenv('ENCODER_ADDRESS'):
+        from encoder_service import RemoteEncoder
+        authkey = os.getenv('ENCODER_AUTHKEY')
+        options['encoder'] = RemoteEncoder(os.getenv('ENCODER_ADDRESS'), authkey.encode() if authkey else None)
+    return options
+
+def process_memory(pid: int):
+    """Return (rss_mb, pss_mb) for a process; PSS splits shared pages between their users"""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if parts[0] in ("Rss:", "Pss:"):
+                    values[parts[0]] = int(parts[1]) / 1024
+    except OSError:
+        return None, None
+    return values.get("Rss:"), values.get("Pss:")
+
+def _run_worker(app_module: str, host: str, port: int, fd: int, quiet: bool):
+    from werkzeug.serving import make_server
+    if quiet:
+        import logging
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    module = importlib.import_module(app_module)
+    make_server(host, port, module.app, threaded=True, fd=fd).serve_forever()
+
+def _wait_for_socket(path: str, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Encoder service did not start within {timeout}s")
+        time.sleep(0.2)
+
+def start_server(workers: int, host: str = '0.0.0.0', port: int = 5000, app_module: str = 'app',
+                 shared: bool = True, central_encoder: bool = False, db_path: str = DB_PATH,
+                 shared_dir: str = SHARED_DIR, quiet: bool = False):
+    """Start the worker pool; returns a dict of handles for stop_server"""
+    context = multiprocessing.get_context('fork')
+    handles = {'workers': [], 'encoder': None, 'watcher': None}
+
+    # Workers read their mode from the environment they inherit
+    for name in ('SHARED_INDEX_MANIFEST', 'ENCODER_ADDRESS', 'ENCODER_AUTHKEY'):
+        os.environ.pop(name, None)
+
+    if shared:
+        manifest = export_shared_index(db_path, shared_dir)
+        os.environ['SHARED_INDEX_MANIFEST'] = manifest
+
+        # Re-export when the database is rebuilt; workers watch the manifest
+        handles['watcher'] = DatabaseWatcher(db_path, lambda: export_shared_index(db_path, shared_dir)).start()
+
+    if central_encoder:
+        from encoder_service import serve
+        address = os.path.abspath(os.path.join(shared_dir, "encoder.sock"))
+        os.makedirs(shared_dir, exist_ok=True)
+        authkey = secrets.token_hex(16)
+        if os.path.exists(address):
+            os.remove(address)
+        handles['encoder'] = context.Process(target=serve, args=(address, authkey.encode()), daemon=True)
+        handles['encoder'].start()
+        _wait_for_socket(address)
+        os.environ['ENCODER_ADDRESS'] = address
+        os.environ['ENCODER_AUTHKEY'] = authkey
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(128)
+    handles['listener'] = listener
+
+    for _ in range(workers):
+        process = context.Process(target=_run_worker, args=(app_module, host, port, listener.fileno(), quiet),
+                                  daemon=True)
+        process.start()
+        handles['workers'].append(process)
+    return handles
+
+def stop_server(handles):
+    for process in handles['workers']:
+        process.terminate()
+    for process in handles['workers']:
+        process.join()
+    if handles['encoder'] is not None:
+        handles['encoder'].terminate()
+        handles['encoder'].join()
+    if handles['watcher'] is not None:
+        handles['watcher'].stop()
+    handles['listener'].close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the MachDatum chatbot from several worker processes")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.getenv('FLASK_PORT', 5000)))
+    parser.add_argument('--app', default='app', help="app (Gemini) or simple_web_app (rule-based)")
+    parser.add_argument('--central-encoder', action='store_true', help="Encode queries in one shared process")
+    parser.add_argument('--no-shared-index', action='store_true', help="Each worker parses the JSON database")
+    args = parser.parse_args()
+
+    handles = start_server(args.workers, args.host, args.port, args.app,
+                           shared=not args.no_shared_index, central_encoder=args.central_encoder)
+    print(f"🚀 Serving {args.app} on http://{args.host}:{args.port} with {args.workers} workers")
+    try:
+        while True:
+            time.sleep(60)
+            for process in handles['workers']:
+                rss, pss = process_memory(process.pid)
+                if rss is not None:
+                    print(f"  worker {process.pid}: RSS {rss:.1f} MB, PSS {pss:.1f} MB")
+    except KeyboardInterrupt:
+        print("\n👋 Stopping workers...")
+    finally:
+        stop_server(handles)
+
+if __name__ == "__main__":
+    main()
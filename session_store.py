@@ -0,0 +1,225 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from retrieval import KnowledgeIndex, normalize_query
+
+# Short questions that lean on the previous turn ("and their email?", "what about pricing")
+FOLLOWUP_PATTERN = re.compile(
+    r"^(and|also|what about|how about|then|so)\b|\b(it|its|they|them|their|those|that|he|she|his|her)\b",
+    re.IGNORECASE
+)
+FOLLOWUP_MAX_WORDS = 8
+
+def is_followup(query: str) -> bool:
+    """Heuristic: a short question that starts with a continuation or uses a pronoun"""
+    return len(query.split()) <= FOLLOWUP_MAX_WORDS and bool(FOLLOWUP_PATTERN.search(query))
+
+class Session:
+    def __init__(self, max_turns: int = 5):
+        """Recent turns of one conversation plus a decayed conversation vector"""
+        self.turns = deque(maxlen=max_turns)
+        self.conversation_vector: Optional[np.ndarray] = None
+        self.last_access = time.time()
+
+    def add_turn(self, query: str, query_embedding, context_ids: List[Any], response: str, decay: float = 0.5):
+        embedding = normalize_query(query_embedding)
+        self.turns.append({
+            'query': query,
+            'embedding': embedding,
+            'context_ids': list(context_ids),
+            'response': response
+        })
+        if self.conversation_vector is None:
+            self.conversation_vector = embedding
+        else:
+            self.conversation_vector = normalize_query(decay * self.conversation_vector + (1 - decay) * embedding)
+        self.last_access = time.time()
+
+    def history(self, turns: int = 2) -> List[Tuple[str, str]]:
+        """The last few (query, response) pairs, oldest first"""
+        return [(turn['query'], turn['response']) for turn in list(self.turns)[-turns:]]
+
+    def nbytes(self) -> int:
+        """Approximate memory held by this session"""
+        size = self.conversation_vector.nbytes if self.conversation_vector is not None else 0
+        for turn in self.turns:
+            size += turn['embedding'].nbytes + len(turn['query']) + len(turn['response']) + 8 * len(turn['context_ids'])
+        return size
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'max_turns': self.turns.maxlen,
+            'turns': [dict(turn, embedding=turn['embedding'].tolist()) for turn in self.turns],
+            'conversation_vector': self.conversation_vector.tolist() if self.conversation_vector is not None else None,
+            'last_access': self.last_access
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Session':
+        session = cls(data['max_turns'])
+        for turn in data['turns']:
+            session.turns.append(dict(turn, embedding=np.asarray(turn['embedding'], dtype=np.float32)))
+        if data['conversation_vector'] is not None:
+            session.conversation_vector = np.asarray(data['conversation_vector'], dtype=np.float32)
+        session.last_access = data['last_access']
+        return session
+
+def resolve_followup(session: Optional[Session], index: KnowledgeIndex, query: str, query_embedding,
+                     weight: float = 0.6, reuse_threshold: float = 0.5, top_k: int = 3):
+    """Return (retrieval_embedding, reused_contexts, followup) for a query in a conversation
+
+    For follow-ups the query embedding is blended with the conversation vector. If
+    the previous turn's context still matches the blended vector well (best cosine
+    >= reuse_threshold) it is reused as is and returned as reused_contexts;
+    otherwise reused_contexts is None and the caller searches with the blended vector.
+    """
+    if session is None or not session.turns or not is_followup(query):
+        return query_embedding, None, False
+
+    blended = normalize_query(weight * normalize_query(query_embedding) + (1 - weight) * session.conversation_vector)
+
+    positions = [index.positions[entry_id] for entry_id in session.turns[-1]['context_ids'] if entry_id in index.positions]
+    if not positions:
+        return blended, None, True
+
+    scores = index.embedding_matrix[positions] @ blended
+    if scores.max() < reuse_threshold:
+        return blended, None, True
+
+    order = np.argsort(-scores)[:top_k]
+    return blended, [{'entry': index.entries[positions[i]], 'similarity': float(scores[i])} for i in order], True
+
+class InMemorySessionStore:
+    def __init__(self, max_sessions: int = 1000, ttl: float = 1800.0, max_bytes: Optional[int] = None,
+                 max_turns: int = 5):
+        """Bounded session store: LRU by last access, expired after ttl seconds idle"""
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_turns = max_turns
+
+        self._sessions = OrderedDict()
+        self._sizes = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, session_id: str) -> Session:
+        """Return the session, creating an empty one if it is new or expired"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and time.time() - session.last_access > self.ttl:
+                self._remove(session_id)
+                session = None
+            if session is None:
+                return Session(self.max_turns)
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def put(self, session_id: str, session: Session):
+        with self._lock:
+            if session_id in self._sessions:
+                self._remove(session_id)
+            size = session.nbytes()
+            self._sessions[session_id] = session
+            self._sizes[session_id] = size
+            self._total_bytes += size
+            self._evict()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'sessions': len(self._sessions),
+                'bytes': self._total_bytes,
+                'evictions': self.evictions
+            }
+
+    def _remove(self, session_id: str):
+        del self._sessions[session_id]
+        self._total_bytes -= self._sizes.pop(session_id)
+
+    def _evict(self):
+        now = time.time()
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            over_count = len(self._sessions) > self.max_sessions
+            over_bytes = self.max_bytes is not None and self._total_bytes > self.max_bytes
+            if not (over_count or over_bytes or now - oldest.last_access > self.ttl):
+                break
+            self._remove(oldest_id)
+            self.evictions += 1
+
+class SQLiteSessionStore:
+    def __init__(self, db_path: str = "sessions.db", max_sessions: int = 10000, ttl: float = 1800.0,
+                 max_turns: int = 5):
+        """Session store in a local SQLite file, so sessions survive restarts and are shared by workers"""
+        self.db_path = db_path
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self._local = threading.local()
+        self.evictions = 0
+
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, last_access REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+
+    def get(self, session_id: str) -> Session:
+        row = self._connection().execute(
+            "SELECT data FROM sessions WHERE session_id = ? AND last_access >= ?",
+            (session_id, time.time() - self.ttl)
+        ).fetchone()
+        return Session.from_dict(json.loads(row[0])) if row else Session(self.max_turns)
+
+    def put(self, session_id: str, session: Session):
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, last_access) VALUES (?, ?, ?)",
+                (session_id, json.dumps(session.to_dict()), session.last_access)
+            )
+            evicted = connection.execute("DELETE FROM sessions WHERE last_access < ?", (time.time() - self.ttl,)).rowcount
+            evicted += connection.execute(
+                "DELETE FROM sessions WHERE session_id IN ("
+                "SELECT session_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,)
+            ).rowcount
+            self.evictions += evicted
+
+    def stats(self) -> Dict[str, Any]:
+        count, size = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM sessions").fetchone()
+        return {
+            'backend': 'sqlite',
+            'sessions': count,
+            'bytes': size,
+            'evictions': self.evictions
+        }
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections cannot be shared across threads
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=10)
+            self._local.connection = connection
+        return connection
+
+def make_session_store(backend: Optional[str], ttl: float = 1800.0, max_sessions: int = 1000,
+                       db_path: str = "sessions.db"):
+    """Build a session store by name ('memory' or 'sqlite'), or None to disable sessions"""
+    if not backend:
+        return None
+    if backend == 'memory':
+        return InMemorySessionStore(max_sessions=max_sessions, ttl=ttl)
+    if backend == 'sqlite':
+        return SQLiteSessionStore(db_path, max_sessions=max_sessions, ttl=ttl)
+    raise ValueError(f"Unknown session store '{backend}'. Choose 'memory' or 'sqlite'")
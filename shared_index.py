@@ -0,0 +1,74 @@
+import json
+import os
+
+import numpy as np
+
+from retrieval import KnowledgeIndex
+
+MANIFEST_NAME = "manifest.json"
+
+def export_shared_index(db_path: str, out_dir: str) -> str:
+    """Write the embedding matrix and content store as files that workers can map read-only
+
+    The matrix goes to a .npy file (memory-mapped by every worker, so the OS page
+    cache holds a single copy) and entries without embeddings to a JSON content
+    store. File names carry the database version and the manifest is replaced
+    last, so workers watching the manifest always see a complete export.
+    Returns the manifest path.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    index = KnowledgeIndex.load(db_path)
+    tag = index.version.replace(os.sep, "_")
+
+    matrix_file = f"matrix-{tag}.npy"
+    np.save(os.path.join(out_dir, matrix_file), np.ascontiguousarray(index.embedding_matrix))
+
+    content_file = f"content-{tag}.json"
+    database = {key: value for key, value in index.database.items() if key != 'knowledge_base'}
+    database['knowledge_base'] = [
+        {key: value for key, value in entry.items() if key != 'embedding'}
+        for entry in index.entries
+    ]
+    with open(os.path.join(out_dir, content_file), 'w', encoding='utf-8') as f:
+        json.dump(database, f, ensure_ascii=False)
+
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    manifest = {
+        "version": index.version,
+        "source": os.path.abspath(db_path),
+        "matrix": matrix_file,
+        "content": content_file,
+        "shape": list(index.embedding_matrix.shape)
+    }
+    with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    _remove_stale_exports(out_dir, keep={matrix_file, content_file})
+    print(f"Exported shared index ({index.embedding_matrix.shape[0]} entries) to {out_dir}")
+    return manifest_path
+
+def attach_shared_index(manifest_path: str) -> KnowledgeIndex:
+    """Open an exported index: the matrix is memory-mapped read-only, not copied"""
+    out_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    matrix = np.load(os.path.join(out_dir, manifest['matrix']), mmap_mode='r')
+    with open(os.path.join(out_dir, manifest['content']), 'r', encoding='utf-8') as f:
+        database = json.load(f)
+    return KnowledgeIndex(database, manifest['version'], manifest_path, embedding_matrix=matrix)
+
+def _remove_stale_exports(out_dir: str, keep: set, keep_previous: int = 1):
+    """Delete old export files, keeping the newest few for workers still mapping them"""
+    stale = [
+        os.path.join(out_dir, name) for name in os.listdir(out_dir)
+        if name.startswith(("matrix-", "content-")) and name not in keep
+    ]
+    stale.sort(key=os.path.getmtime, reverse=True)
+    # Each export is a (matrix, content) pair
+    for path in stale[2 * keep_previous:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -1,6 +1,12 @@
 from flask import Flask, render_template, request, jsonify
 from flask_cors import CORS
 from simple_rag_chatbot import SimpleRAGChatbot
+from reranker import make_reranker
+from hot_reload import DatabaseWatcher
+from session_store import make_session_store
+from answer_table import AnswerTable
+from parallel_search import make_searcher
+from serve_shared import serving_options_from_env
 import os
 from dotenv import load_dotenv
 
@@ -17,7 +23,40 @@ CORS(app)
 FLASK_PORT = int(os.getenv('FLASK_PORT', 5000))
 FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
 
+# Two-stage retrieval: re-rank a wider cosine candidate pool ('lexical', 'linear', 'cross-encoder')
+RERANK_SCORER = os.getenv('RERANK_SCORER', '')
+RERANK_CANDIDATE_POOL = int(os.getenv('RERANK_CANDIDATE_POOL', 20))
+RERANK_BUDGET_MS = float(os.getenv('RERANK_BUDGET_MS', 50))
+
+# Hot reload: poll the database file every DB_WATCH_INTERVAL seconds (0 disables)
+DB_WATCH_INTERVAL = float(os.getenv('DB_WATCH_INTERVAL', 5))
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+# KNOWLEDGE_DB may point at a SQLite store (.sqlite) written by create_database.py --sqlite;
+# under serve_shared.py workers map the exported index (and watch its manifest) instead
+DB_SOURCE = os.getenv('SHARED_INDEX_MANIFEST') or os.getenv('KNOWLEDGE_DB', "machdatum_rag_db.json")
+
+# Conversation sessions ('memory', 'sqlite', or empty to disable)
+SESSION_STORE = os.getenv('SESSION_STORE', 'memory')
+SESSION_TTL_SECONDS = float(os.getenv('SESSION_TTL_SECONDS', 1800))
+SESSION_MAX = int(os.getenv('SESSION_MAX', 1000))
+SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', 'sessions.db')
+
+# Precomputed answers for frequent questions, built with answer_table.py (empty to disable)
+ANSWER_TABLE_PATH = os.getenv('ANSWER_TABLE_PATH', '')
+ANSWER_TABLE_THRESHOLD = float(os.getenv('ANSWER_TABLE_THRESHOLD', 0.97))
+
+# Exact search over SEARCH_THREADS threads in blocks of SEARCH_BLOCK_ROWS rows
+# (1 = blocked scan on the request thread, 0 = plain NumPy scan of the whole matrix)
+SEARCH_THREADS = int(os.getenv('SEARCH_THREADS', 1))
+SEARCH_BLOCK_ROWS = int(os.getenv('SEARCH_BLOCK_ROWS', 4096))
+
+# Query encoder is chosen by ENCODER (see encoders.py); refuse a database it does not reproduce
+# to within ENCODER_TOLERANCE cosine (empty to skip the check)
+ENCODER_TOLERANCE = float(os.getenv('ENCODER_TOLERANCE', 0.05)) if os.getenv('ENCODER_TOLERANCE', '0.05') else None
+
 chatbot = None
+db_watcher = None
 
 @app.route('/')
 def home():
@@ -25,26 +64,40 @@ def home():
 
 @app.route('/chat', methods=['POST'])
 def chat():
-    global chatbot
+    global chatbot, db_watcher
     
     try:
         data = request.json
         user_message = data.get('message', '')
+        session_id = data.get('session_id')
         
         if not user_message:
             return jsonify({'error': 'No message provided'}), 400
         
         # Initialize chatbot if not already done
         if chatbot is None:
-            chatbot = SimpleRAGChatbot("machdatum_rag_db.json")
+            chatbot = SimpleRAGChatbot(DB_SOURCE,
+                                       reranker=make_reranker(RERANK_SCORER, RERANK_BUDGET_MS),
+                                       candidate_pool=RERANK_CANDIDATE_POOL,
+                                       session_store=make_session_store(SESSION_STORE, SESSION_TTL_SECONDS,
+                                                                        SESSION_MAX, SESSION_DB_PATH),
+                                       answer_table=AnswerTable(ANSWER_TABLE_PATH, ANSWER_TABLE_THRESHOLD)
+                                       if ANSWER_TABLE_PATH else None,
+                                       searcher=make_searcher(SEARCH_THREADS, SEARCH_BLOCK_ROWS),
+                                       encoder_tolerance=ENCODER_TOLERANCE,
+                                       **serving_options_from_env())
+            if DB_WATCH_INTERVAL > 0:
+                db_watcher = DatabaseWatcher(DB_SOURCE, chatbot.reload_database,
+                                             interval=DB_WATCH_INTERVAL).start()
         
         # Get response
-        result = chatbot.chat(user_message)
+        result = chatbot.chat(user_message, session_id=session_id)
         
         return jsonify({
             'response': result['response'],
             'context_count': len(result['context_used']),
-            'similarity_scores': result['similarity_scores']
+            'similarity_scores': result['similarity_scores'],
+            'served_by': result['served_by']
         })
         
     except Exception as e:
@@ -54,9 +107,28 @@ def chat():
 def health():
     return jsonify({'status': 'healthy'})
 
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'error': 'Forbidden'}), 403
+    if chatbot is None:
+        return jsonify({'status': 'not_loaded'})
+    
+    try:
+        # In-flight requests finish on the previous index while this one is built.
+        # Go through the watcher (when running) so it does not load the same file again
+        if db_watcher is not None:
+            reloaded = db_watcher.reload()
+        else:
+            reloaded = chatbot.reload_database()
+        return jsonify({'status': 'reloaded' if reloaded else 'unchanged', 'version': chatbot.index.version,
+                        'entries': len(chatbot.index.entries)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 if __name__ == '__main__':
     print("🚀 Starting MachDatum RAG Chatbot Web Interface...")
-    print(f"📁 Database: machdatum_rag_db.json")
+    print(f"📁 Database: {DB_SOURCE}")
     print(f"🌐 URL: http://localhost:{FLASK_PORT}")
     print("💡 Note: This version uses rule-based responses with RAG context")
     print("-" * 60)
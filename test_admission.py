@@ -0,0 +1,71 @@
+import threading
+
+from admission import Overloaded, Stage, RateLimiter, make_admission_controller
+
+def hold_slot(stage, entered, release):
+    with stage.slot():
+        entered.set()
+        release.wait(2)
+
+def test_full_queue_is_rejected_with_503():
+    stage = Stage("generate", concurrency=1, queue_size=0, queue_timeout=1.0)
+    entered, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=hold_slot, args=(stage, entered, release))
+    holder.start()
+    entered.wait(2)
+    try:
+        with stage.slot():
+            raise AssertionError("admitted past a full stage")
+    except Overloaded as e:
+        assert e.status == 503
+        assert int(e.retry_after_header()) >= 1
+    finally:
+        release.set()
+        holder.join()
+    assert stage.stats()['rejected_full'] == 1
+
+def test_queue_timeout_is_rejected_and_slot_frees_up():
+    stage = Stage("retrieve", concurrency=1, queue_size=4, queue_timeout=0.05)
+    entered, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=hold_slot, args=(stage, entered, release))
+    holder.start()
+    entered.wait(2)
+    try:
+        with stage.slot():
+            raise AssertionError("admitted while the only slot was held")
+    except Overloaded as e:
+        assert e.status == 503
+    release.set()
+    holder.join()
+
+    with stage.slot():
+        pass
+    stats = stage.stats()
+    assert stats['rejected_timeout'] == 1
+    assert stats['admitted'] == 2
+    assert stats['in_flight'] == 0 and stats['queued'] == 0
+
+def test_rate_limit_returns_429_per_client():
+    limiter = RateLimiter(rate=1.0, burst=2)
+    limiter.check("a")
+    limiter.check("a")
+    try:
+        limiter.check("a")
+        raise AssertionError("third request within the burst was allowed")
+    except Overloaded as e:
+        assert e.status == 429
+        assert e.retry_after_header() == "1"
+    limiter.check("b")  # Other clients have their own bucket
+
+def test_controller_config():
+    assert make_admission_controller(encode=0, retrieve=0, generate=0) is None
+    controller = make_admission_controller(encode=0, retrieve=0, generate=2, max_in_flight=1)
+    assert list(controller.stages) == ['generate']
+    with controller.request("a"):
+        with controller.stage('encode'):  # Unlimited stage
+            pass
+        try:
+            with controller.request("b"):
+                raise AssertionError("admitted past max_in_flight")
+        except Overloaded as e:
+            assert e.status == 503
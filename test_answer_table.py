@@ -0,0 +1,86 @@
+import json
+import os
+import time
+
+from answer_table import AnswerTable, normalize_question, SERVED_PRECOMPUTED
+from encoders import HashEncoder
+from simple_rag_chatbot import SimpleRAGChatbot
+
+ENCODER = HashEncoder()
+CONTENTS = [
+    "MachDatum provides data engineering and analytics services",
+    "Contact MachDatum by email at info@machdatum.com",
+    "The team works with Python, Spark and cloud platforms"
+]
+
+def write_database(path, contents):
+    embeddings = ENCODER.encode(contents)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'knowledge_base': [
+            {'id': i + 1, 'content': content, 'category': 'General', 'embedding': embedding.tolist()}
+            for i, (content, embedding) in enumerate(zip(contents, embeddings))
+        ]}, f)
+
+def make_chatbot(tmp_path, table_path=None):
+    db_path = str(tmp_path / "db.json")
+    if not os.path.exists(db_path):
+        write_database(db_path, CONTENTS)
+    answer_table = AnswerTable(table_path) if table_path else None
+    return SimpleRAGChatbot(db_path, encoder=ENCODER, answer_table=answer_table)
+
+def test_normalize_question():
+    assert normalize_question("  What's   MachDatum's EMAIL? ") == "what s machdatum s email"
+
+def test_build_stores_only_real_answers_with_their_context(tmp_path):
+    chatbot = make_chatbot(tmp_path)
+    table = AnswerTable(str(tmp_path / "table.json"))
+    table.build(chatbot, [CONTENTS[0], "zzqx unrelated"])
+
+    with open(table.path, 'r', encoding='utf-8') as f:
+        stored = json.load(f)
+    assert stored['version'] == chatbot.index.version
+    assert stored['questions'] == [CONTENTS[0], "zzqx unrelated"]  # Skipped ones are retried next time
+    assert [answer['question'] for answer in stored['answers']] == [CONTENTS[0]]
+    answer = stored['answers'][0]
+    assert answer['context_ids'][0] == 1
+    assert 'served_by' not in answer['result'] and 'context_ids' not in answer['result']
+
+def test_lookup_by_text_and_embedding(tmp_path):
+    table_path = str(tmp_path / "table.json")
+    AnswerTable(table_path).build(make_chatbot(tmp_path), [CONTENTS[1]])
+    chatbot = make_chatbot(tmp_path, table_path)
+
+    result = chatbot.chat(CONTENTS[1].upper() + "?")
+    assert result['served_by'] == SERVED_PRECOMPUTED
+    assert result['context_ids'][0] == 2
+
+    table = chatbot.answer_table
+    assert table.lookup_embedding(ENCODER.encode(CONTENTS[1]), chatbot.index.version) is not None
+    assert table.lookup_embedding(ENCODER.encode("Spark and cloud"), chatbot.index.version) is None
+    assert table.lookup_text(CONTENTS[1], "another version") is None
+
+    # use_precomputed=False always answers live
+    assert chatbot.chat(CONTENTS[1], use_precomputed=False)['served_by'] == "rule_based"
+
+def test_stale_table_is_rebuilt_after_a_reload(tmp_path):
+    table_path = str(tmp_path / "table.json")
+    AnswerTable(table_path).build(make_chatbot(tmp_path), [CONTENTS[2]])
+    chatbot = make_chatbot(tmp_path, table_path)
+    old_version = chatbot.index.version
+    assert not chatbot.answer_table.is_stale(old_version)
+
+    write_database(str(tmp_path / "db.json"), CONTENTS + ["MachDatum is based in Chennai"])
+    stamp = time.time() + 10
+    os.utime(str(tmp_path / "db.json"), (stamp, stamp))
+    assert chatbot.reload_database()
+
+    # Rebuilt in the background with the table's own questions
+    for _ in range(200):
+        if not chatbot.answer_table.is_stale(chatbot.index.version):
+            break
+        time.sleep(0.01)
+    assert chatbot.answer_table.version == chatbot.index.version != old_version
+    assert chatbot.chat(CONTENTS[2])['served_by'] == SERVED_PRECOMPUTED
+
+    # Another worker sharing the file loads the rebuilt table instead of building its own
+    assert not make_chatbot(tmp_path, table_path).answer_table.is_stale(chatbot.index.version)
@@ -0,0 +1,65 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from encoder_service import RemoteEncoder, serve
+from encoders import HashEncoder, make_encoder, lowest_agreement, check_compatibility
+from retrieval import KnowledgeIndex
+
+def make_index(contents, embeddings):
+    database = {'knowledge_base': [
+        {'id': i, 'content': content, 'category': 'General', 'embedding': list(map(float, embedding))}
+        for i, (content, embedding) in enumerate(zip(contents, embeddings))
+    ]}
+    return KnowledgeIndex(database, version="test")
+
+def test_hash_encoder_is_deterministic_and_normalized():
+    encoder = make_encoder('hash')
+    first = encoder.encode(["MachDatum data engineering", "Contact us by email"])
+    second = HashEncoder().encode(["MachDatum data engineering", "Contact us by email"])
+
+    assert first.shape == (2, encoder.dimension)
+    assert first.dtype == np.float32
+    assert np.array_equal(first, second)
+    assert np.allclose(np.linalg.norm(first, axis=1), 1.0)
+    assert encoder.encode("MachDatum data engineering").shape == (encoder.dimension,)
+
+def test_hash_encoder_similar_texts_score_higher():
+    encoder = HashEncoder()
+    query, near, far = encoder.encode(["data engineering services", "data engineering", "office phone number"])
+    assert query @ near > query @ far
+
+def test_check_compatibility_accepts_own_vectors_and_skips_placeholders():
+    encoder = HashEncoder()
+    contents = ["MachDatum builds data pipelines", "Email the team", "placeholder entry"]
+    embeddings = list(encoder.encode(contents[:2])) + [np.zeros(encoder.dimension)]
+    assert check_compatibility(encoder, make_index(contents, embeddings)) > 0.99
+
+    # Only a placeholder row: nothing to compare
+    assert lowest_agreement(encoder, make_index(contents[2:], embeddings[2:])) == 1.0
+
+def test_check_compatibility_rejects_other_vectors():
+    encoder = HashEncoder()
+    contents = ["MachDatum builds data pipelines", "Email the team"]
+    embeddings = np.ones((2, encoder.dimension)) / np.sqrt(encoder.dimension)
+    try:
+        check_compatibility(encoder, make_index(contents, embeddings))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("mismatched vectors were accepted")
+
+def test_remote_encoder_reports_the_service_encoder(tmp_path):
+    address = str(tmp_path / "encoder.sock")
+    threading.Thread(target=serve, args=(address, b"test", 'hash'), daemon=True).start()
+    for _ in range(200):
+        if os.path.exists(address):
+            break
+        time.sleep(0.01)
+
+    encoder = RemoteEncoder(address, b"test")
+    assert (encoder.name, encoder.dimension) == (HashEncoder.name, HashEncoder().dimension)
+    assert np.array_equal(encoder.encode(["MachDatum data engineering"]),
+                          HashEncoder().encode(["MachDatum data engineering"]))
@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+import time
+
+from encoders import HashEncoder
+from hot_reload import DatabaseWatcher
+from retrieval import KnowledgeIndex
+from simple_rag_chatbot import SimpleRAGChatbot
+
+ENCODER = HashEncoder()
+
+def write_database(path, contents):
+    embeddings = ENCODER.encode(contents)
+    database = {'knowledge_base': [
+        {'id': i, 'content': content, 'category': 'General', 'embedding': embedding.tolist()}
+        for i, (content, embedding) in enumerate(zip(contents, embeddings))
+    ]}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(database, f)
+    # Distinct mtimes even on coarse filesystem clocks
+    stamp = time.time() + len(contents)
+    os.utime(path, (stamp, stamp))
+
+def test_watcher_waits_for_the_file_to_settle(tmp_path):
+    path = str(tmp_path / "db.json")
+    write_database(path, ["first"])
+    reloads = []
+    watcher = DatabaseWatcher(path, lambda: reloads.append(1), interval=0.05).start()
+    try:
+        write_database(path, ["first", "second"])
+        time.sleep(0.04)
+        assert reloads == []  # Seen at most once so far
+        for _ in range(100):
+            if reloads:
+                break
+            time.sleep(0.02)
+        assert reloads == [1]
+        time.sleep(0.2)
+        assert reloads == [1]  # Same version is not loaded again
+    finally:
+        watcher.stop()
+
+def test_watcher_reload_shares_the_loaded_version(tmp_path):
+    path = str(tmp_path / "db.json")
+    write_database(path, ["first"])
+    reloads = []
+    watcher = DatabaseWatcher(path, lambda: reloads.append(1), interval=60)
+
+    assert watcher.reload() is False
+    write_database(path, ["first", "second"])
+    assert watcher.reload() is True
+    assert watcher.reload() is False
+    assert reloads == [1]
+
+def test_failed_reload_is_retried(tmp_path):
+    path = str(tmp_path / "db.json")
+    write_database(path, ["first"])
+    calls = []
+
+    def on_change():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ValueError("bad file")
+    watcher = DatabaseWatcher(path, on_change, interval=60)
+    write_database(path, ["first", "second"])
+    try:
+        watcher.reload()
+    except ValueError:
+        pass
+    assert watcher.reload() is True
+    assert len(calls) == 2
+
+def test_chatbot_reload_swaps_and_skips_unchanged(tmp_path):
+    path = str(tmp_path / "db.json")
+    write_database(path, ["MachDatum builds data pipelines"])
+    chatbot = SimpleRAGChatbot(path, encoder=ENCODER, encoder_tolerance=0.05)
+    old_index = chatbot.index
+
+    assert chatbot.reload_database() is False
+    write_database(path, ["MachDatum builds data pipelines", "Email the team"])
+    assert chatbot.reload_database() is True
+    assert len(chatbot.index.entries) == 2
+    assert len(old_index.entries) == 1  # Requests still on the old snapshot are unaffected
+
+def test_older_load_finishing_last_is_not_swapped_in(tmp_path):
+    old_path, new_path = str(tmp_path / "old.json"), str(tmp_path / "new.json")
+    write_database(old_path, ["old entry"])
+    write_database(new_path, ["new entry", "another new entry"])
+
+    release_old = threading.Event()
+    chatbot_ready = threading.Event()
+
+    def loader(db_path):
+        # The load of the old file stalls until the newer load has been swapped in
+        if db_path == old_path and chatbot_ready.is_set():
+            release_old.wait(2)
+        return KnowledgeIndex.load(db_path)
+    chatbot = SimpleRAGChatbot(new_path, encoder=ENCODER, index_loader=loader)
+    write_database(new_path, ["new entry", "another new entry", "third"])
+    chatbot_ready.set()
+
+    results = {}
+    slow = threading.Thread(target=lambda: results.setdefault('old', chatbot.load_database(old_path)))
+    slow.start()
+    time.sleep(0.05)  # The old load has taken its sequence number
+    results['new'] = chatbot.load_database(new_path)
+    release_old.set()
+    slow.join()
+
+    assert results == {'new': True, 'old': False}
+    assert chatbot.index.db_path == new_path
+    assert len(chatbot.index.entries) == 3
@@ -0,0 +1,65 @@
+import os
+import threading
+
+import numpy as np
+
+from encoders import HashEncoder
+from knowledge_store import write_sqlite_store, open_sqlite_store
+from retrieval import KnowledgeIndex
+
+def make_database(contents, version):
+    embeddings = HashEncoder().encode(contents)
+    return {'metadata': {'version': version}, 'knowledge_base': [
+        {'id': 100 + i, 'content': content, 'category': 'General', 'metadata': {'n': i},
+         'embedding': embedding.tolist()}
+        for i, (content, embedding) in enumerate(zip(contents, embeddings))
+    ]}
+
+def test_round_trip_and_fetch_order(tmp_path):
+    store_path = str(tmp_path / "kb.sqlite")
+    contents = [f"entry number {i}" for i in range(2500)]
+    database = make_database(contents, "a")
+    write_sqlite_store(database, store_path, batch_size=1000)
+
+    loaded, matrix = open_sqlite_store(store_path)
+    entries = loaded['knowledge_base']
+    assert loaded['metadata'] == {'version': "a"}
+    assert len(entries) == 2500
+    assert isinstance(matrix, np.memmap)
+    assert np.allclose(matrix, HashEncoder().encode(contents))
+
+    assert [entry['id'] for entry in entries.fetch([7, 2, 2400, 7])] == [107, 102, 2500, 107]
+    assert entries[3] == {'id': 103, 'content': "entry number 3", 'category': 'General', 'metadata': {'n': 3}}
+    assert [entry['content'] for entry in entries] == contents  # Iterates across pages
+
+    index = KnowledgeIndex.load(store_path)
+    assert index.positions[2499 + 100] == 2499
+    assert 99 not in index.positions
+
+def test_old_index_keeps_its_generation_after_rebuilds(tmp_path):
+    store_path = str(tmp_path / "kb.sqlite")
+    write_sqlite_store(make_database(["old first", "old second"], "old"), store_path)
+    old_index = KnowledgeIndex.load(store_path)
+
+    # Two rebuilds delete the old generation's files
+    write_sqlite_store(make_database(["new first", "new second"], "new"), store_path)
+    write_sqlite_store(make_database(["newest first", "newest second"], "newest"), store_path)
+    assert len([name for name in os.listdir(tmp_path) if name.startswith("kb.entries-")]) == 2
+    new_index = KnowledgeIndex.load(store_path)
+
+    # Connections are busy elsewhere: the next reader must not reopen the deleted file by path
+    with old_index.entries.connection(), old_index.entries.connection():
+        assert old_index.entries.fetch([1])[0]['content'] == "old second"
+
+    # More concurrent readers than pooled connections wait for one
+    results = []
+    def read():
+        results.append((old_index.entries.fetch([0])[0]['content'], new_index.entries[0]['content']))
+    threads = [threading.Thread(target=read) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [("old first", "newest first")] * 20
+
+    assert float(old_index.embedding_matrix[0] @ HashEncoder().encode("old first")) > 0.99
@@ -0,0 +1,77 @@
+import threading
+import time
+
+from latency_slo import (SLOGenerator, SERVED_LLM, SERVED_LLM_HEDGED, SERVED_LLM_CACHED,
+                         SERVED_FALLBACK_TIMEOUT, SERVED_FALLBACK_ERROR)
+
+CONTEXT = [{'entry': {'id': 1, 'content': "MachDatum provides data engineering"}, 'similarity': 0.9}]
+
+def fallback(query, context_entries):
+    return "fallback"
+
+def test_fast_answer_is_served_and_cached():
+    calls = []
+    generator = SLOGenerator(lambda prompt: calls.append(prompt) or "answer", fallback, deadline=1.0)
+
+    assert generator.generate("q", CONTEXT, "prompt", version="v1") == ("answer", SERVED_LLM)
+    assert generator.generate("q", CONTEXT, "prompt", version="v1") == ("answer", SERVED_LLM_CACHED)
+    assert len(calls) == 1
+
+    # Same question with a different history (prompt) is not served from the cache
+    assert generator.generate("q", CONTEXT, "other prompt", version="v1") == ("answer", SERVED_LLM)
+    assert generator.stats()['served_by'] == {SERVED_LLM: 2, SERVED_LLM_CACHED: 1}
+
+def test_timeout_falls_back_and_caches_the_late_answer():
+    release = threading.Event()
+
+    def slow(prompt):
+        release.wait(2)
+        return "late answer"
+    generator = SLOGenerator(slow, fallback, deadline=0.05)
+
+    assert generator.generate("q", CONTEXT, "prompt", version="v1") == ("fallback", SERVED_FALLBACK_TIMEOUT)
+    release.set()
+    for _ in range(100):
+        if generator.stats()['cached_answers']:
+            break
+        time.sleep(0.01)
+    assert generator.generate("q", CONTEXT, "prompt", version="v1") == ("late answer", SERVED_LLM_CACHED)
+
+def test_errors_fall_back():
+    def failing(prompt):
+        raise RuntimeError("quota exceeded")
+    generator = SLOGenerator(failing, fallback, deadline=0.5)
+    assert generator.generate("q", CONTEXT, "prompt") == ("fallback", SERVED_FALLBACK_ERROR)
+
+def test_hedge_wins_when_the_primary_stalls():
+    calls = []
+    lock = threading.Lock()
+
+    def first_call_stalls(prompt):
+        with lock:
+            calls.append(prompt)
+            first = len(calls) == 1
+        if first:
+            time.sleep(1.0)
+        return "answer"
+    generator = SLOGenerator(first_call_stalls, fallback, deadline=0.5, hedge_after=0.05)
+
+    assert generator.generate("q", CONTEXT, "prompt") == ("answer", SERVED_LLM_HEDGED)
+    assert len(calls) == 2
+
+def test_queued_calls_are_cancelled_when_abandoned():
+    started = []
+    release = threading.Event()
+
+    def blocking(prompt):
+        started.append(prompt)
+        release.wait(2)
+        return "answer"
+    generator = SLOGenerator(blocking, fallback, deadline=0.05, max_workers=1)
+
+    # The only worker is busy with the first call; the second request's call never starts
+    generator.generate("q1", CONTEXT, "prompt 1")
+    generator.generate("q2", CONTEXT, "prompt 2")
+    release.set()
+    time.sleep(0.1)
+    assert started == ["prompt 1"]
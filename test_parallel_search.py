@@ -0,0 +1,66 @@
+import tracemalloc
+
+import numpy as np
+
+from parallel_search import BlockedSearcher, make_searcher
+from retrieval import top_candidates
+
+def test_blocked_search_matches_top_candidates():
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((10000, 16)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    searcher = BlockedSearcher(threads=4, block_rows=700, min_parallel_rows=0)
+    try:
+        for _ in range(10):
+            query = rng.standard_normal(16)
+            expected_rows, expected_scores = top_candidates(matrix, query, 10)
+            rows, scores = searcher.top_candidates(matrix, query, 10)
+            assert np.array_equal(rows, expected_rows)
+            assert np.allclose(scores, expected_scores)
+    finally:
+        searcher.close()
+
+def test_ties_go_to_the_lower_row():
+    matrix = np.full((5000, 4), 0.5, dtype=np.float32)
+    searcher = BlockedSearcher(threads=4, block_rows=1000, min_parallel_rows=0)
+    try:
+        assert top_candidates(matrix, np.ones(4), 3)[0].tolist() == [0, 1, 2]
+        assert searcher.top_candidates(matrix, np.ones(4), 3)[0].tolist() == [0, 1, 2]
+
+        # Partial ties around the cut, in every block
+        rng = np.random.default_rng(1)
+        matrix = rng.integers(0, 3, (6000, 8)).astype(np.float32)
+        for n in (1, 5, 17):
+            query = rng.integers(0, 3, 8) + 0.5
+            assert np.array_equal(searcher.top_candidates(matrix, query, n)[0], top_candidates(matrix, query, n)[0])
+    finally:
+        searcher.close()
+
+def test_small_or_empty_inputs():
+    searcher = BlockedSearcher(threads=2, block_rows=4, min_parallel_rows=0)
+    try:
+        rows, scores = searcher.top_candidates(np.zeros((0, 4), dtype=np.float32), np.ones(4), 3)
+        assert rows.shape == (0,) and scores.shape == (0,)
+
+        matrix = np.eye(4, dtype=np.float32)
+        rows, _ = searcher.top_candidates(matrix, np.array([0.1, 0.4, 0.3, 0.2]), 10)
+        assert rows.tolist() == [1, 2, 3, 0]
+    finally:
+        searcher.close()
+
+def test_single_thread_runs_the_blocked_kernel():
+    rng = np.random.default_rng(2)
+    matrix = rng.standard_normal((200000, 8)).astype(np.float32)
+    query = rng.standard_normal(8)
+
+    searcher = make_searcher(1, block_rows=4096)
+    assert searcher is not None and searcher.threads == 1
+    assert make_searcher(0) is None
+
+    expected_rows, _ = top_candidates(matrix, query, 10)
+    tracemalloc.start()
+    rows, _ = searcher.top_candidates(matrix, query, 10)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert np.array_equal(rows, expected_rows)
+    assert peak < matrix.shape[0]  # A quarter of one float32 score per row
@@ -0,0 +1,75 @@
+import time
+
+from reranker import Reranker, LexicalOverlapScorer, make_reranker
+
+def make_candidates(contents):
+    return [
+        {'entry': {'id': i, 'content': content}, 'similarity': 0.9 - 0.01 * i}
+        for i, content in enumerate(contents)
+    ]
+
+class CountingScorer:
+    """Scores by a fixed table, counting how many candidates it was asked to score"""
+
+    def __init__(self, scores, seconds_per_item=0.0):
+        self.scores = scores
+        self.seconds_per_item = seconds_per_item
+        self.scored = 0
+
+    def score(self, query, candidates):
+        time.sleep(self.seconds_per_item * len(candidates))
+        self.scored += len(candidates)
+        return [self.scores[candidate['entry']['id']] for candidate in candidates]
+
+def test_lexical_rerank_moves_matching_entries_first():
+    candidates = make_candidates(["Our office is in Chennai", "Email info@machdatum.com", "We build data pipelines"])
+    reranker = Reranker(LexicalOverlapScorer(), budget_ms=1000)
+    results = reranker.rerank("data pipelines", candidates, top_k=2)
+    assert [result['entry']['id'] for result in results] == [2, 0]
+    assert results[0]['rerank_score'] == 1.0
+
+def test_scores_are_cached_per_version():
+    scorer = CountingScorer({i: 1.0 for i in range(5)})
+    reranker = Reranker(scorer, budget_ms=1000)
+    candidates = make_candidates(["entry"] * 5)
+
+    reranker.rerank("q", candidates, top_k=3, version="v1")
+    assert scorer.scored == 5
+    reranker.rerank("q", candidates, top_k=3, version="v1")
+    assert scorer.scored == 5
+    reranker.rerank("q", candidates, top_k=3, version="v2")
+    assert scorer.scored == 10
+
+    reranker.clear_cache()
+    reranker.rerank("q", candidates, top_k=3, version="v2")
+    assert scorer.scored == 15
+
+def test_budget_cut_keeps_bi_encoder_order_for_the_rest():
+    # The first call only probes one candidate, so a slow scorer stays within its budget
+    scorer = CountingScorer({0: 0.1, 1: 0.2, 2: 0.9, 3: 0.8, 4: 0.7}, seconds_per_item=0.02)
+    reranker = Reranker(scorer, budget_ms=30, batch_size=16)
+    results = reranker.rerank("q", make_candidates(["entry"] * 5), top_k=5)
+
+    assert scorer.scored == 1
+    assert [result['entry']['id'] for result in results] == [0, 1, 2, 3, 4]
+    assert 'rerank_score' in results[0] and 'rerank_score' not in results[1]
+
+def test_equal_scores_keep_bi_encoder_order_with_a_partial_cache():
+    scorer = CountingScorer({i: 0.5 for i in range(5)})
+    reranker = Reranker(scorer, budget_ms=1000)
+    candidates = make_candidates(["entry"] * 5)
+
+    # Entries 3 and 4 are cached first, as after a budget cut on another call
+    reranker.rerank("q", candidates[3:], top_k=2)
+    results = reranker.rerank("q", candidates, top_k=3)
+    assert [result['entry']['id'] for result in results] == [0, 1, 2]
+
+def test_make_reranker():
+    assert make_reranker(None) is None
+    assert isinstance(make_reranker('lexical').scorer, LexicalOverlapScorer)
+    try:
+        make_reranker('unknown')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown scorer accepted")
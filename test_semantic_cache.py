@@ -0,0 +1,43 @@
+import numpy as np
+
+from semantic_cache import SemanticCache
+
+def unit(values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+def test_near_duplicate_hits_and_others_miss():
+    cache = SemanticCache(capacity=4, similarity_threshold=0.95, verify_rate=0.0)
+    cache.invalidate("v1")
+    cache.store(unit([1, 0, 0]), "v1", {'response': "services"}, [1, 2])
+
+    hit = cache.lookup(unit([1, 0.05, 0]), "v1")
+    assert hit['result'] == {'response': "services"}
+    assert hit['context_ids'] == [1, 2]
+    assert not hit['verify']
+
+    assert cache.lookup(unit([1, 1, 0]), "v1") is None  # cosine 0.71, below the threshold
+    assert cache.lookup(unit([1, 0, 0]), "v2") is None  # another database version
+
+def test_invalidate_drops_answers_and_old_versions_are_not_stored():
+    cache = SemanticCache(capacity=4, similarity_threshold=0.95)
+    cache.invalidate("v1")
+    cache.store(unit([0, 1, 0]), "v1", {'response': "contact"}, [3])
+    cache.invalidate("v2")
+    assert cache.lookup(unit([0, 1, 0]), "v2") is None
+
+    cache.store(unit([0, 1, 0]), "v1", {'response': "late"}, [3])  # Computed before the reload
+    assert cache.lookup(unit([0, 1, 0]), "v2") is None
+    assert cache.stats()['entries'] == 0
+
+def test_least_recently_used_slot_is_evicted():
+    cache = SemanticCache(capacity=2, similarity_threshold=0.95, verify_rate=0.0)
+    cache.invalidate("v1")
+    cache.store(unit([1, 0, 0]), "v1", {'response': "a"}, [])
+    cache.store(unit([0, 1, 0]), "v1", {'response': "b"}, [])
+    cache.lookup(unit([1, 0, 0]), "v1")
+    cache.store(unit([0, 0, 1]), "v1", {'response': "c"}, [])
+
+    assert cache.lookup(unit([1, 0, 0]), "v1")['result']['response'] == "a"
+    assert cache.lookup(unit([0, 1, 0]), "v1") is None
+    assert cache.lookup(unit([0, 0, 1]), "v1")['result']['response'] == "c"
@@ -0,0 +1,107 @@
+import numpy as np
+
+from encoders import HashEncoder
+from retrieval import KnowledgeIndex
+from session_store import (Session, InMemorySessionStore, SQLiteSessionStore, is_followup, resolve_followup,
+                           make_session_store)
+
+ENCODER = HashEncoder()
+
+def session_with_turn(query="What services does MachDatum provide?", context_ids=(1,), response="Data engineering"):
+    session = Session()
+    session.add_turn(query, ENCODER.encode(query), list(context_ids), response)
+    return session
+
+def make_index(contents):
+    embeddings = ENCODER.encode(contents)
+    return KnowledgeIndex({'knowledge_base': [
+        {'id': i + 1, 'content': content, 'category': 'General', 'embedding': embedding.tolist()}
+        for i, (content, embedding) in enumerate(zip(contents, embeddings))
+    ]}, version="test")
+
+def test_is_followup():
+    assert is_followup("and their email?")
+    assert is_followup("What about pricing")
+    assert not is_followup("What services does MachDatum provide?")
+    assert not is_followup("Tell me everything about it because I am writing a very long report today")
+
+def test_memory_store_evicts_least_recently_used():
+    store = InMemorySessionStore(max_sessions=2, ttl=60)
+    store.put("a", session_with_turn())
+    store.put("b", session_with_turn())
+    store.get("a")
+    store.put("c", session_with_turn())
+
+    assert store.get("a").turns
+    assert not store.get("b").turns
+    assert store.get("c").turns
+    assert store.stats()['sessions'] == 2
+    assert store.stats()['evictions'] == 1
+
+def test_memory_store_expires_idle_sessions_and_caps_bytes():
+    store = InMemorySessionStore(max_sessions=10, ttl=60)
+    session = session_with_turn()
+    store.put("old", session)
+    session.last_access -= 120
+    assert not store.get("old").turns
+    assert store.stats() == {'backend': 'memory', 'sessions': 0, 'bytes': 0, 'evictions': 0}
+
+    size = session_with_turn().nbytes()
+    store = InMemorySessionStore(max_sessions=10, ttl=60, max_bytes=2 * size)
+    for session_id in ("a", "b", "c"):
+        store.put(session_id, session_with_turn())
+    stats = store.stats()
+    assert stats['sessions'] == 2 and stats['bytes'] <= 2 * size
+    assert not store.get("a").turns
+
+def test_sqlite_store_round_trip_and_eviction(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), max_sessions=2, ttl=60)
+    first = session_with_turn()
+    store.put("a", first)
+    loaded = store.get("a")
+    assert loaded.history() == [("What services does MachDatum provide?", "Data engineering")]
+    assert np.allclose(loaded.conversation_vector, first.conversation_vector)
+
+    for session_id in ("b", "c"):
+        session = session_with_turn()
+        session.last_access = first.last_access + 1
+        store.put(session_id, session)
+    assert not store.get("a").turns  # Least recently active beyond max_sessions
+    assert store.stats()['sessions'] == 2
+
+    stale = session_with_turn()
+    stale.last_access -= 120
+    store.put("stale", stale)
+    assert not store.get("stale").turns
+
+    # Another store on the same file (e.g. another worker) sees the sessions
+    assert SQLiteSessionStore(str(tmp_path / "sessions.db"), max_sessions=2, ttl=60).get("c").turns
+
+def test_resolve_followup_reuses_or_blends():
+    index = make_index(["MachDatum data engineering services", "Email info@machdatum.com", "Offices in Chennai"])
+    query = "and their email?"
+    embedding = ENCODER.encode(query)
+
+    # Standalone question: searched as is
+    retrieval_embedding, reused, followup = resolve_followup(session_with_turn(), index, "Where are the offices?",
+                                                             ENCODER.encode("Where are the offices?"))
+    assert not followup and reused is None
+
+    # No session: never a follow-up
+    assert resolve_followup(None, index, query, embedding)[2] is False
+
+    # The previous context still matches: reused without a search
+    session = session_with_turn("MachDatum data engineering services", context_ids=[1])
+    retrieval_embedding, reused, followup = resolve_followup(session, index, query, embedding, reuse_threshold=0.0)
+    assert followup and [context['entry']['id'] for context in reused] == [1]
+    assert np.isclose(np.linalg.norm(retrieval_embedding), 1.0)
+
+    # It no longer matches: search again with the blended vector
+    retrieval_embedding, reused, followup = resolve_followup(session, index, query, embedding, reuse_threshold=1.01)
+    assert followup and reused is None
+    assert not np.allclose(retrieval_embedding, embedding)
+
+def test_make_session_store(tmp_path):
+    assert make_session_store(None) is None
+    assert isinstance(make_session_store('memory'), InMemorySessionStore)
+    assert isinstance(make_session_store('sqlite', db_path=str(tmp_path / "s.db")), SQLiteSessionStore)
@@ -0,0 +1,57 @@
+import json
+import os
+
+import numpy as np
+
+from encoders import HashEncoder
+from retrieval import KnowledgeIndex, top_candidates
+from shared_index import export_shared_index, attach_shared_index, MANIFEST_NAME
+
+def write_database(path, contents):
+    embeddings = HashEncoder().encode(contents)
+    database = {'metadata': {'source_document': "test"}, 'knowledge_base': [
+        {'id': i + 1, 'content': content, 'category': 'General', 'embedding': embedding.tolist()}
+        for i, (content, embedding) in enumerate(zip(contents, embeddings))
+    ]}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(database, f)
+
+def test_export_and_attach_round_trip(tmp_path):
+    db_path = str(tmp_path / "db.json")
+    write_database(db_path, ["MachDatum builds data pipelines", "Email the team", "Offices in Chennai"])
+    manifest_path = export_shared_index(db_path, str(tmp_path / "shared"))
+
+    original = KnowledgeIndex.load(db_path)
+    attached = attach_shared_index(manifest_path)
+
+    assert isinstance(attached.embedding_matrix, np.memmap)
+    assert not attached.embedding_matrix.flags.writeable
+    assert np.array_equal(np.asarray(attached.embedding_matrix), original.embedding_matrix)
+    assert attached.version == original.version
+    assert attached.database['metadata'] == {'source_document': "test"}
+    assert [entry['content'] for entry in attached.entries] == [entry['content'] for entry in original.entries]
+    assert all('embedding' not in entry for entry in attached.entries)
+    assert attached.positions[2] == 1
+
+    query = HashEncoder().encode("data pipelines")
+    assert np.array_equal(top_candidates(attached.embedding_matrix, query, 2)[0],
+                          top_candidates(original.embedding_matrix, query, 2)[0])
+
+def test_reexport_keeps_the_previous_files_only(tmp_path):
+    db_path = str(tmp_path / "db.json")
+    out_dir = str(tmp_path / "shared")
+    exports = []
+    for count in range(1, 5):
+        write_database(db_path, [f"entry {i}" for i in range(count)])
+        stamp = 1_000_000 + count
+        os.utime(db_path, (stamp, stamp))
+        manifest_path = export_shared_index(db_path, out_dir)
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            exports.append(json.load(f))
+
+    files = set(os.listdir(out_dir))
+    assert MANIFEST_NAME in files
+    for manifest in exports[-2:]:
+        assert {manifest['matrix'], manifest['content']} <= files
+    assert exports[0]['matrix'] not in files
+    assert len(attach_shared_index(os.path.join(out_dir, MANIFEST_NAME)).entries) == 4